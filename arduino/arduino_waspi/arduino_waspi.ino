@@ -18,6 +18,15 @@ DFRobot_SCD4X scd41 = DFRobot_SCD4X();
 // Reporting time interval
 const unsigned int reportingInterval = 120000; // every minute
 
+// SerialTransfer packet IDs -> see sensor_manager.py
+const uint8_t PERIODIC_REPORT_ID = 0;
+const uint8_t MEASURE_REQUEST_ID = 1;
+const uint8_t MEASURE_REPLY_ID = 2;
+
+// Load cell samples averaged for periodic reports and for host requests
+const int reportScaleSamples = 50;
+const int requestScaleSamples = 10;
+
 // Arduino Pins - LoadCell Sensor
 const int loadCell_DoutPin = 9;
 const int loadCell_SckPin = 10;
@@ -80,9 +89,7 @@ void setup() {
 }
 
 // ---- Serial Transfer Function ---- //
-void sendPeriodicReport(){
-  
-  float sendSize = 0;
+uint16_t packSensorValues(uint16_t sendSize){
 
   // Pack loadCell data (float)
   sendSize = tfr.txObj(loadCell_Value, sendSize);
@@ -100,25 +107,38 @@ void sendPeriodicReport(){
   sendSize = tfr.txObj(scd41_humidity, sendSize); 
   sendSize = tfr.txObj(scd41_co2ppm, sendSize);  
 
+  return sendSize;
+}
+
+void sendPeriodicReport(){
+  
+  uint16_t sendSize = packSensorValues(0);
 
-  // Send data (packet ID = 16) -> see callbacks w_serial.py
-  tfr.sendData(sendSize, 0);
+  // Send data (packet ID = 0) -> see callbacks w_serial.py
+  tfr.sendData(sendSize, PERIODIC_REPORT_ID);
 }
 
+// ---- Host Measurement Request ---- //
+void handleMeasureRequest(){
 
-// ---- Loop Function ---- //
-void loop(){
+  // The host sends a uint16 sequence number, echoed back in the reply
+  uint16_t sequence;
+  tfr.rxObj(sequence, 0);
 
-  // Get the starting time
-  unsigned long startTime = millis();
+  // Measure now, without waiting for a new SCD41 reading
+  readSensors(requestScaleSamples, false);
+
+  uint16_t sendSize = tfr.txObj(sequence, 0);
+  sendSize = packSensorValues(sendSize);
+  tfr.sendData(sendSize, MEASURE_REPLY_ID);
+}
+
+// ---- Read Sensors Function ---- //
+void readSensors(int scaleSamples, bool waitForScd41){
 
-  // --- Read and print sensors data
-  
   // 1 - Load Cell
   scale.set_scale(calibration_factor_scale_2);
-  loadCell_Value = scale.get_units(50);
-  Serial.print("weight: ");
-  Serial.println(loadCell_Value, 3);
+  loadCell_Value = scale.get_units(scaleSamples);
   
   // 2 - Temperature & Humidity
   sensors_event_t hum, temp;
@@ -131,11 +151,6 @@ void loop(){
   sht45_0_temperature = temp.temperature;
   sht45_0_humidity = hum.relative_humidity;
 
-  Serial.print("temp_sht0: ");
-  Serial.println(sht45_0_temperature);
-  Serial.print("hum_sht0: ");
-  Serial.println(sht45_0_humidity);
-
   // SHT45_#1
   I2CMultiplexer.selectPort(1);
   delay(100);
@@ -143,31 +158,50 @@ void loop(){
   sht45_1.getEvent(&hum, &temp);
   sht45_1_temperature = temp.temperature;
   sht45_1_humidity = hum.relative_humidity;
-
-  Serial.print("temp_sht1: ");
-  Serial.println(sht45_1_temperature);
-  Serial.print("hum_sht1: ");
-  Serial.println(sht45_1_humidity);
   
   // 3 - CO2 with Temperature & Humdity
   I2CMultiplexer.selectPort(2);
   delay(100);
 
   // SCD41
-  bool isDataReady = false;
+  bool isDataReady = scd41.getDataReadyStatus();
 
   // Wait until data is ready
-  while (!isDataReady) {
-    isDataReady = scd41.getDataReadyStatus();
+  while (waitForScd41 && !isDataReady) {
     delay(50); // Poll every 50ms to avoid busy waiting
+    isDataReady = scd41.getDataReadyStatus();
   }
   
-  DFRobot_SCD4X::sSensorMeasurement_t data;
-  scd41.readMeasurement(&data);
-  scd41_temperature = data.temp;
-  scd41_humidity = data.humidity;
-  scd41_co2ppm = data.CO2ppm;
+  // Otherwise keep the last SCD41 reading
+  if (isDataReady) {
+    DFRobot_SCD4X::sSensorMeasurement_t data;
+    scd41.readMeasurement(&data);
+    scd41_temperature = data.temp;
+    scd41_humidity = data.humidity;
+    scd41_co2ppm = data.CO2ppm;
+  }
+}
+
+
+// ---- Loop Function ---- //
+void loop(){
+
+  // Get the starting time
+  unsigned long startTime = millis();
 
+  // --- Read and print sensors data
+  readSensors(reportScaleSamples, true);
+
+  Serial.print("weight: ");
+  Serial.println(loadCell_Value, 3);
+  Serial.print("temp_sht0: ");
+  Serial.println(sht45_0_temperature);
+  Serial.print("hum_sht0: ");
+  Serial.println(sht45_0_humidity);
+  Serial.print("temp_sht1: ");
+  Serial.println(sht45_1_temperature);
+  Serial.print("hum_sht1: ");
+  Serial.println(sht45_1_humidity);
   Serial.print("temp_scd41: ");
   Serial.println(scd41_temperature);
   Serial.print("hum_scd41: ");
@@ -180,8 +214,11 @@ void loop(){
   // --- Send data to Serial
   sendPeriodicReport();
 
-  // --- Stay in UART Tx loop until the next report
+  // --- Stay in UART loop until the next report, answering host requests
   while(true){
+    if (tfr.available() && tfr.currentPacketID() == MEASURE_REQUEST_ID)
+      handleMeasureRequest();
+
     unsigned long currentMillis = millis();
     if (currentMillis - startTime >= reportingInterval)
     return;
@@ -49,7 +49,8 @@ localSyncRecAccel_Path="${syncRoot}/${DirRecordingsAccel}/"
 
 #Use rclone to copy folder over to gdrive
 #rclone copy $localSyncImages_Path $rcloneName:$remoteSyncDir/$DirImages/$date_now
-rclone copy $localSyncRecAccel_Path $rcloneName:$remoteSyncDir/$DirRecordingsAccel/$date_now
+# Segments being recorded are named .*.part until complete, skip them
+rclone copy --exclude ".*.part" $localSyncRecAccel_Path $rcloneName:$remoteSyncDir/$DirRecordingsAccel/$date_now
 
 # Check if rclone command was successful
 if [ $? -eq 0 ]; then
@@ -57,7 +58,7 @@ if [ $? -eq 0 ]; then
     # Delete the files that were sync
     #rm -rf "$localSyncImages_Path"
     #rm -rf "$DirImages"
-    rm "$DirRecordingsAccel/"*.wav
+    rm -f "$DirRecordingsAccel/"*.wav "$DirRecordingsAccel/"*.flac
 else
     echo "Rclone sync operation failed."
     exit 1
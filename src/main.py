@@ -1,4 +1,5 @@
 import asyncio
+import signal
 from pathlib import Path
 
 from waspi.components.program_orchestrator import (
@@ -63,7 +64,18 @@ async def main():
         orchestrator=orchestrator,
         coordinator=coordinator,
     )
-    await sync_orchestrator.run_continuous_with_sync_awareness()
+
+    # systemctl stop sends SIGTERM: cancel the main task so the orchestrator
+    # drains its queues and finalises the open recordings before exiting
+    loop = asyncio.get_running_loop()
+    main_task = asyncio.current_task()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, main_task.cancel)
+
+    try:
+        await sync_orchestrator.run_continuous_with_sync_awareness()
+    except asyncio.CancelledError:
+        pass
 
 
 if __name__ == "__main__":
@@ -1,4 +1,8 @@
 import sys
+import time
+
+
+BUFFER_TYPES = (bytes, bytearray, memoryview)
 
 
 class CRC(object):
@@ -6,56 +10,113 @@ class CRC(object):
         self.poly      = polynomial & 0xFF
         self.crc_len   = crc_len
         self.table_len = pow(2, crc_len)
-        self.cs_table  = [' ' for x in range(self.table_len)]
-        
+        self.cs_table  = bytes(self.table_len)
+
         self.generate_table()
-    
+
     def generate_table(self):
-        for i in range(len(self.cs_table)):
+        table = []
+
+        for i in range(self.table_len):
             curr = i
-            
+
             for j in range(8):
                 if (curr & 0x80) != 0:
                     curr = ((curr << 1) & 0xFF) ^ self.poly
                 else:
                     curr <<= 1
-            
-            self.cs_table[i] = curr
-    
+
+            table.append(curr & 0xFF)
+
+        self.cs_table = bytes(table)
+
     def print_table(self):
         for i in range(len(self.cs_table)):
             sys.stdout.write(hex(self.cs_table[i]).upper().replace('X', 'x'))
-            
+
             if (i + 1) % 16:
                 sys.stdout.write(' ')
             else:
                 sys.stdout.write('\n')
-    
+
+    def calculate_buffer(self, buff, start=0, length=None):
+        '''
+        Description:
+        ------------
+        Calculate the CRC of a slice of a bytes-like object without copying it
+
+        :param buff:   bytes, bytearray or memoryview - data to checksum
+        :param start:  int - index of the first byte to include
+        :param length: int - number of bytes to include, defaults to the rest
+                             of the buffer
+
+        :return crc: int - CRC of the given bytes
+        '''
+
+        if length is None:
+            length = len(buff) - start
+
+        table = self.cs_table
+        crc = 0
+
+        for byte in memoryview(buff).cast('B')[start:(start + length)]:
+            crc = table[crc ^ byte]
+
+        return crc
+
     def calculate(self, arr, dist=None):
+        if isinstance(arr, BUFFER_TYPES):
+            return self.calculate_buffer(arr, 0, dist)
+
         crc = 0
-        
+
         try:
             if dist:
                 indicies = dist
             else:
                 indicies = len(arr)
-            
+
             for i in range(indicies):
                 try:
                     nex_el = int(arr[i])
                 except ValueError:
                     nex_el = ord(arr[i])
-                
+
                 crc = self.cs_table[crc ^ nex_el]
-                
+
         except TypeError:
             crc = self.cs_table[arr]
-            
+
         return crc
 
 
+def benchmark(size=0xFE, repeat=2000):
+    '''
+    Description:
+    ------------
+    Micro-benchmark of the buffer CRC path over packet-sized payloads
+
+    :param size:   int - payload size in bytes
+    :param repeat: int - number of payloads to checksum
+
+    :return: float - throughput in MB/s
+    '''
+
+    crc = CRC()
+    payload = bytearray(i & 0xFF for i in range(size))
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        crc.calculate_buffer(payload, 0, size)
+    elapsed = time.perf_counter() - start
+
+    return (size * repeat) / elapsed / 1e6
+
+
 if __name__ == '__main__':
     crc = CRC()
     print(crc.print_table())
     print(' ')
-    print(hex(crc.calculate(0x31)).upper().replace('X', 'x'))
\ No newline at end of file
+    print(hex(crc.calculate(0x31)).upper().replace('X', 'x'))
+    print(' ')
+    print('CRC throughput: {:.2f} MB/s'.format(benchmark()))
@@ -1,5 +1,6 @@
 import os
 import json
+import time
 import struct
 import serial
 import serial.tools.list_ports
@@ -26,6 +27,12 @@ START_BYTE = 0x7E
 STOP_BYTE  = 0x81
 
 MAX_PACKET_SIZE = 0xFE
+RX_READ_SIZE    = 0x1000
+
+# Frame layout: START_BYTE, packet ID, overhead byte, payload length,
+# payload, CRC, STOP_BYTE
+PREAMBLE_SIZE   = 4
+POSTAMBLE_SIZE  = 2
 
 BYTE_FORMATS = {'native':          '@',
                 'native_standard': '=',
@@ -72,6 +79,92 @@ find_crc           = 5
 find_end_byte      = 6
 
 
+# Upper bounds (in s) of the decode latency histogram buckets
+LATENCY_BUCKETS = (1e-5, 2e-5, 5e-5, 1e-4, 2e-4, 5e-4, 1e-3, 2e-3, 5e-3, 1e-2, float('inf'))
+
+
+class LinkStats(object):
+    def __init__(self):
+        '''
+        Description:
+        ------------
+        Health counters of a serial link
+
+        bytes_received:   int   - bytes read from the port
+        bytes_discarded:  int   - bytes skipped while looking for a start byte
+        frames_decoded:   int   - packets parsed without error
+        crc_errors:       int   - packets with a wrong CRC
+        payload_errors:   int   - packets with a length above MAX_PACKET_SIZE
+        stop_byte_errors: int   - packets with a wrong stop byte
+        resyncs:          int   - times a good packet was recovered after
+                                  an error or a rejected start byte
+        last_frame_time:  float - time.monotonic() of the last good packet
+        latency_counts:   list  - histogram of the time between reading the
+                                  last byte of a packet from the port and
+                                  decoding it, see LATENCY_BUCKETS
+        '''
+
+        self.reset()
+
+    def reset(self):
+        self.bytes_received   = 0
+        self.bytes_discarded  = 0
+        self.frames_decoded   = 0
+        self.crc_errors       = 0
+        self.payload_errors   = 0
+        self.stop_byte_errors = 0
+        self.resyncs          = 0
+        self.last_frame_time  = None
+        self.latency_counts   = [0 for _ in LATENCY_BUCKETS]
+
+    def record_frame(self, latency):
+        self.frames_decoded += 1
+        self.last_frame_time = time.monotonic()
+
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.latency_counts[i] += 1
+                break
+
+    def record_error(self, status):
+        if status == CRC_ERROR:
+            self.crc_errors += 1
+        elif status == PAYLOAD_ERROR:
+            self.payload_errors += 1
+        elif status == STOP_BYTE_ERROR:
+            self.stop_byte_errors += 1
+
+    @property
+    def errors(self):
+        return self.crc_errors + self.payload_errors + self.stop_byte_errors
+
+    @property
+    def seconds_since_last_frame(self):
+        if self.last_frame_time is None:
+            return None
+        return time.monotonic() - self.last_frame_time
+
+    def as_dict(self):
+        '''
+        Description:
+        ------------
+        Snapshot of the counters, e.g. to log or publish them
+
+        :return: dict - counter names and values
+        '''
+
+        return {'bytes_received':           self.bytes_received,
+                'bytes_discarded':          self.bytes_discarded,
+                'frames_decoded':           self.frames_decoded,
+                'crc_errors':               self.crc_errors,
+                'payload_errors':           self.payload_errors,
+                'stop_byte_errors':         self.stop_byte_errors,
+                'resyncs':                  self.resyncs,
+                'seconds_since_last_frame': self.seconds_since_last_frame,
+                'latency_buckets':          [str(b) for b in LATENCY_BUCKETS],
+                'latency_counts':           list(self.latency_counts)}
+
+
 def msb(val):
     return byte_val(val, num_bytes(val) - 1)
 
@@ -131,7 +224,7 @@ def serial_ports():
 
 
 class SerialTransfer(object):
-    def __init__(self, port, baud=115200, restrict_ports=True, debug=True, byte_format=BYTE_FORMATS['little-endian'], timeout=0.05):
+    def __init__(self, port, baud=115200, restrict_ports=True, debug=False, byte_format=BYTE_FORMATS['little-endian'], timeout=0.05):
         '''
         Description:
         ------------
@@ -141,6 +234,8 @@ class SerialTransfer(object):
         :param baud: int        - baud (bits per sec) the device is configured for
         :param restrict_ports: bool - only allow port selection from auto
                                       detected list
+        :param debug:          bool - print errors from self.tick(). Errors
+                                      are always counted in self.stats
         :param byte_format:    str  - format for values packed/unpacked via the
                                       struct package as defined by
                                       https://docs.python.org/3/library/struct.html#struct-format-strings
@@ -149,16 +244,34 @@ class SerialTransfer(object):
         :return: void
         '''
 
-        self.txBuff = [' ' for i in range(MAX_PACKET_SIZE)]
-        self.rxBuff = [' ' for i in range(MAX_PACKET_SIZE)]
+        # The TX buffer is a view on the payload section of a preallocated
+        # frame, so packets are stuffed, checksummed and written in place
+        self.txFrame = bytearray(PREAMBLE_SIZE + MAX_PACKET_SIZE + POSTAMBLE_SIZE)
+        self.txView = memoryview(self.txFrame)
+        self.txBuff = self.txView[PREAMBLE_SIZE:(PREAMBLE_SIZE + MAX_PACKET_SIZE)]
+        self.rxBuff = bytearray(MAX_PACKET_SIZE)
+        self.rxView = memoryview(self.rxBuff)
+
+        # Raw bytes pulled from the port in bulk, parsed between readHead and
+        # readTail
+        self.readBuff = bytearray(RX_READ_SIZE)
+        self.readView = memoryview(self.readBuff)
+        self.readHead = 0
+        self.readTail = 0
+        self.readTime = 0.0
+
+        self.stats = LinkStats()
+        self.resyncing = False
 
         self.debug        = debug
         self.idByte       = 0
         self.bytesRead    = 0
         self.bytesTotal   = None # EDIT
-        self.status       = 0
+        self.status       = NO_DATA
         self.overheadByte = 0xFF
-        self.callbacks    = []
+        self.recOverheadByte = 0xFF
+        self.bytesToRec   = 0
+        self.callbacks    = {}
         self.byte_format  = byte_format
 
         self.state = find_start_byte
@@ -205,17 +318,23 @@ class SerialTransfer(object):
         '''
         Description:
         ------------
-        Specify a list of callback functions to be automatically called by
+        Specify the callback functions to be automatically called by
         self.tick() when a new packet is fully parsed. The ID of the parsed
         packet is then used to determine which callback needs to be called.
 
+        :param callbacks: list or dict - callbacks indexed by packet ID, or
+                                         a dict mapping packet IDs to
+                                         callbacks
+
         :return: void
         '''
         
         if type(callbacks) == list:
-            self.callbacks = callbacks
+            self.callbacks = dict(enumerate(callbacks))
+        elif type(callbacks) == dict:
+            self.callbacks = dict(callbacks)
         else:
-            raise InvalidCallbackList('Parameter "callbacks" is not of type "list"')
+            raise InvalidCallbackList('Parameter "callbacks" is not of type "list" or "dict"')
 
     def close(self):
         '''
@@ -278,15 +397,16 @@ class SerialTransfer(object):
                 return None
       
         if byte_format:
-            val_bytes = struct.pack(byte_format + format_str, val)
+            format_str = byte_format + format_str
             
         else:
             if format_str == 'c':
-                val_bytes = struct.pack(self.byte_format + format_str, bytes(str(val), "utf-8"))
-            else:
-                val_bytes = struct.pack(self.byte_format + format_str, val)
+                val = bytes(str(val), "utf-8")
+            format_str = self.byte_format + format_str
+
+        struct.pack_into(format_str, self.txBuff, start_pos, val)
 
-        return self.tx_struct_obj(val_bytes, start_pos)
+        return start_pos + struct.calcsize(format_str)
 
     def tx_struct_obj(self, val_bytes, start_pos=0):
         '''
@@ -302,8 +422,7 @@ class SerialTransfer(object):
                        None if operation failed
         '''
       
-        for index in range(len(val_bytes)):
-            self.txBuff[index + start_pos] = val_bytes[index]
+        self.txBuff[start_pos:(start_pos + len(val_bytes))] = val_bytes
         
         return start_pos + len(val_bytes)
 
@@ -334,49 +453,42 @@ class SerialTransfer(object):
         '''
         
         if (obj_type == str) or (obj_type == dict):
-            buff = bytes(self.rxBuff[start_pos:(start_pos + obj_byte_size)])
-            format_str = '%ds' % len(buff)
+            format_str = '%ds' % obj_byte_size
             
         elif obj_type == float:
             format_str = 'f'
-            buff = bytes(self.rxBuff[start_pos:(start_pos + STRUCT_FORMAT_LENGTHS[format_str])])
             
         elif obj_type == int:
             # EDIT
             if byte_format:
-                buff = bytes(self.rxBuff[start_pos:(start_pos + obj_byte_size)])
                 format_str = ''
             else:
                 format_str = 'i'
-                buff = bytes(self.rxBuff[start_pos:(start_pos + STRUCT_FORMAT_LENGTHS[format_str])])
             # EDIT
 
         elif obj_type == bool:
             format_str = '?'
-            buff = bytes(self.rxBuff[start_pos:(start_pos + STRUCT_FORMAT_LENGTHS[format_str])])
             
         elif obj_type == list:
-            buff = bytes(self.rxBuff[start_pos:(start_pos + obj_byte_size)])
-            
             if list_format:
-                arr = array(list_format, buff)
+                arr = array(list_format)
+                arr.frombytes(self.rxView[start_pos:(start_pos + obj_byte_size)])
                 return arr.tolist()
             
             else:
                 return None
         
         elif type(obj_type) == str:
-            buff = bytes(self.rxBuff[start_pos:(start_pos + STRUCT_FORMAT_LENGTHS[obj_type])])
             format_str = obj_type
         
         else:
             return None
         
         if byte_format:
-            unpacked_response = struct.unpack(byte_format + format_str, buff)[0]
+            unpacked_response = struct.unpack_from(byte_format + format_str, self.rxBuff, start_pos)[0]
             
         else:
-            unpacked_response = struct.unpack(self.byte_format + format_str, buff)[0]
+            unpacked_response = struct.unpack_from(self.byte_format + format_str, self.rxBuff, start_pos)[0]
         
         if (obj_type == str) or (obj_type == dict):
             unpacked_response = unpacked_response.decode('utf-8')
@@ -386,6 +498,19 @@ class SerialTransfer(object):
         
         return unpacked_response
 
+    def rx_payload(self):
+        '''
+        Description:
+        ------------
+        Zero-copy view of the payload of the last packet parsed by
+        self.available(). The view is only valid until the next packet is
+        parsed
+
+        :return: memoryview - payload bytes of the last received packet
+        '''
+
+        return self.rxView[:self.bytesRead]
+
     def calc_overhead(self, pay_len):
         '''
         Description:
@@ -400,12 +525,12 @@ class SerialTransfer(object):
         :return: void
         '''
 
-        self.overheadByte = 0xFF
+        index = self.txFrame.find(START_BYTE, PREAMBLE_SIZE, PREAMBLE_SIZE + pay_len)
 
-        for i in range(pay_len):
-            if self.txBuff[i] == START_BYTE:
-                self.overheadByte = i
-                break
+        if index == -1:
+            self.overheadByte = 0xFF
+        else:
+            self.overheadByte = index - PREAMBLE_SIZE
 
     def find_last(self, pay_len):
         '''
@@ -421,9 +546,10 @@ class SerialTransfer(object):
         '''
 
         if pay_len <= MAX_PACKET_SIZE:
-            for i in range(pay_len - 1, -1, -1):
-                if self.txBuff[i] == START_BYTE:
-                    return i
+            index = self.txFrame.rfind(START_BYTE, PREAMBLE_SIZE, PREAMBLE_SIZE + pay_len)
+
+            if index != -1:
+                return index - PREAMBLE_SIZE
         return -1
 
     def stuff_packet(self, pay_len):
@@ -431,7 +557,9 @@ class SerialTransfer(object):
         Description:
         ------------
         Enforces the COBS (Consistent Overhead Stuffing) ruleset across
-        all bytes in the packet against the value of START_BYTE
+        all bytes in the packet against the value of START_BYTE. Each
+        START_BYTE is replaced in place by the distance to the next one, and
+        the last one by 0
 
         :param pay_len: int - number of bytes in the payload
 
@@ -439,18 +567,20 @@ class SerialTransfer(object):
         '''
 
         refByte = self.find_last(pay_len)
+        index = refByte
 
-        if (not refByte == -1) and (refByte <= MAX_PACKET_SIZE):
-            for i in range(pay_len - 1, 0, -1):
-                if self.txBuff[i] == START_BYTE:
-                    self.txBuff[i] = refByte - i
-                    refByte = i
+        while index != -1:
+            prevIndex = self.txFrame.rfind(START_BYTE, PREAMBLE_SIZE, PREAMBLE_SIZE + index)
+            self.txBuff[index] = refByte - index
+            refByte = index
+            index = prevIndex if prevIndex == -1 else prevIndex - PREAMBLE_SIZE
 
     def send(self, message_len, packet_id=0):
         '''
         Description:
         ------------
-        Send a specified number of bytes in packetized form
+        Send a specified number of bytes in packetized form. The frame is
+        built around the payload already in txBuff and written in one call
 
         :param message_len: int - number of bytes from the txBuff to send as
                                   payload in the packet
@@ -458,34 +588,24 @@ class SerialTransfer(object):
         :return: bool - whether or not the operation was successful
         '''
 
-        stack = []
         message_len = constrain(message_len, 0, MAX_PACKET_SIZE)
+        frame = self.txFrame
 
         try:
             self.calc_overhead(message_len)
             self.stuff_packet(message_len)
-            found_checksum = self.crc.calculate(self.txBuff, message_len)
-
-            stack.append(START_BYTE)
-            stack.append(packet_id)
-            stack.append(self.overheadByte)
-            stack.append(message_len)
 
-            for i in range(message_len):
-                if type(self.txBuff[i]) == str:
-                    val = ord(self.txBuff[i])
-                else:
-                    val = int(self.txBuff[i])
+            frame[0] = START_BYTE
+            frame[1] = packet_id
+            frame[2] = self.overheadByte
+            frame[3] = message_len
 
-                stack.append(val)
+            crcIndex = PREAMBLE_SIZE + message_len
+            frame[crcIndex] = self.crc.calculate_buffer(frame, PREAMBLE_SIZE, message_len)
+            frame[crcIndex + 1] = STOP_BYTE
 
-            stack.append(found_checksum)
-            stack.append(STOP_BYTE)
-
-            stack = bytearray(stack)
-            
             if self.open():
-                self.connection.write(stack)
+                self.connection.write(self.txView[:(crcIndex + POSTAMBLE_SIZE)])
 
             return True
 
@@ -509,14 +629,168 @@ class SerialTransfer(object):
         testIndex = self.recOverheadByte
         delta = 0
 
-        if testIndex <= MAX_PACKET_SIZE:
-            while self.rxBuff[testIndex]:
-                delta = self.rxBuff[testIndex]
-                self.rxBuff[testIndex] = START_BYTE
-                testIndex += delta
-
+        # The header is not covered by the CRC, so a corrupted overhead byte
+        # must not walk outside the payload
+        while testIndex < pay_len:
+            delta = self.rxBuff[testIndex]
             self.rxBuff[testIndex] = START_BYTE
 
+            if not delta:
+                break
+            testIndex += delta
+
+    def read_into_buffer(self):
+        '''
+        Description:
+        ------------
+        Pull everything currently waiting on the serial port into the read
+        buffer with a single read. Unparsed bytes, e.g. the start of an
+        incomplete frame, are first moved to the front of the buffer
+
+        :return: int - number of bytes added to the read buffer
+        '''
+
+        pending = self.readTail - self.readHead
+
+        if self.readHead:
+            self.readBuff[:pending] = self.readView[self.readHead:self.readTail]
+            self.readHead = 0
+            self.readTail = pending
+
+        waiting = min(self.connection.in_waiting, RX_READ_SIZE - pending)
+
+        if not waiting:
+            return 0
+
+        count = self.connection.readinto(self.readView[pending:(pending + waiting)])
+        self.readTail = pending + count
+        self.readTime = time.perf_counter()
+        self.stats.bytes_received += count
+
+        return count
+
+    def check_frame(self, start):
+        '''
+        Description:
+        ------------
+        Validate the candidate frame whose START_BYTE is at the given index
+        of the read buffer, without consuming it
+
+        :param start: int - index of the candidate START_BYTE
+
+        :return: int - NEW_DATA if the frame is complete and valid, CONTINUE
+                       if more bytes are needed, else the error status
+        '''
+
+        buff = self.readBuff
+        available = self.readTail - start
+
+        if available < PREAMBLE_SIZE:
+            return CONTINUE
+
+        payLen = buff[start + 3]
+
+        if payLen > MAX_PACKET_SIZE:
+            return PAYLOAD_ERROR
+
+        end = start + PREAMBLE_SIZE + payLen + POSTAMBLE_SIZE
+
+        if end > self.readTail:
+            return CONTINUE
+
+        found_checksum = self.crc.calculate_buffer(buff, start + PREAMBLE_SIZE, payLen)
+
+        if found_checksum != buff[end - 2]:
+            return CRC_ERROR
+
+        if buff[end - 1] != STOP_BYTE:
+            return STOP_BYTE_ERROR
+
+        return NEW_DATA
+
+    def parse(self):
+        '''
+        Description:
+        ------------
+        Scan the buffered bytes for the next frame. Each START_BYTE candidate
+        is validated as a whole (length, CRC and STOP_BYTE) before it is
+        accepted. A rejected candidate only discards its START_BYTE, so a
+        good frame hidden behind a corrupted one is still found
+
+        :return self.bytesRead: int - number of bytes read from the received
+                                      packet
+        '''
+
+        buff = self.readBuff
+        index = self.readHead
+        tail = self.readTail
+
+        self.bytesRead = 0
+        self.status = CONTINUE
+        self.state = find_start_byte
+
+        while index < tail:
+            start = buff.find(START_BYTE, index, tail)
+
+            if start == -1:
+                self.stats.bytes_discarded += tail - index
+                index = tail
+                break
+
+            self.stats.bytes_discarded += start - index
+            index = start
+            result = self.check_frame(start)
+
+            if result == CONTINUE:
+                # Wait for the rest of the frame, unless a later candidate
+                # already forms a complete valid frame
+                later = buff.find(START_BYTE, start + 1, tail)
+
+                while later != -1 and self.check_frame(later) != NEW_DATA:
+                    later = buff.find(START_BYTE, later + 1, tail)
+
+                if later == -1:
+                    self.state = find_payload
+                    break
+
+                self.stats.bytes_discarded += later - start
+                self.resyncing = True
+                index = start = later
+                result = NEW_DATA
+
+            if result == NEW_DATA:
+                payStart = start + PREAMBLE_SIZE
+                self.idByte = buff[start + 1]
+                self.recOverheadByte = buff[start + 2]
+                self.bytesToRec = buff[start + 3]
+
+                self.rxBuff[:self.bytesToRec] = self.readView[payStart:(payStart + self.bytesToRec)]
+                self.unpack_packet(self.bytesToRec)
+
+                index = payStart + self.bytesToRec + POSTAMBLE_SIZE
+                self.bytesRead = self.bytesToRec
+                self.status = NEW_DATA
+                break
+
+            # Drop this START_BYTE only and look for the next candidate
+            self.stats.bytes_discarded += 1
+            index = start + 1
+            self.status = result
+            break
+
+        self.readHead = index
+
+        if self.status == NEW_DATA:
+            if self.resyncing:
+                self.stats.resyncs += 1
+                self.resyncing = False
+            self.stats.record_frame(time.perf_counter() - self.readTime)
+        elif self.status < NO_DATA:
+            self.stats.record_error(self.status)
+            self.resyncing = True
+
+        return self.bytesRead
+
     def available(self):
         '''
         Description:
@@ -529,88 +803,15 @@ class SerialTransfer(object):
         '''
 
         if self.open():
-            if self.connection.in_waiting:
-                while self.connection.in_waiting:
-                    recChar = int.from_bytes(self.connection.read(),
-                                             byteorder='big')
-
-                    if self.state == find_start_byte:
-                        if recChar == START_BYTE:
-                            self.state = find_id_byte
-                    
-                    elif self.state == find_id_byte:
-                        self.idByte = recChar
-                        self.state = find_overhead_byte
-
-                    elif self.state == find_overhead_byte:
-                        self.recOverheadByte = recChar
-                        self.state = find_payload_len
-
-                    elif self.state == find_payload_len:
-                        if recChar <= MAX_PACKET_SIZE:
-                            self.bytesToRec = recChar
-                            self.payIndex = 0
-                            self.state = find_payload
-                        else:
-                            self.bytesRead = 0
-                            self.state = find_start_byte
-                            self.status = PAYLOAD_ERROR
-                            return self.bytesRead
-
-                    elif self.state == find_payload:
-                        if self.payIndex < self.bytesToRec:
-                            self.rxBuff[self.payIndex] = recChar
-                            self.payIndex += 1
-
-                            # Try to receive as many more bytes as we can, but we might not get all of them
-                            # if there is a timeout from the OS
-                            if self.payIndex != self.bytesToRec:
-                                moreBytes = list(self.connection.read(self.bytesToRec - self.payIndex))
-                                nextIndex = self.payIndex + len(moreBytes)
-
-                                self.rxBuff[self.payIndex:nextIndex] = moreBytes
-                                self.payIndex = nextIndex
-
-                            if self.payIndex == self.bytesToRec:
-                                self.state = find_crc
-
-                    elif self.state == find_crc:
-                        found_checksum = self.crc.calculate(
-                            self.rxBuff, self.bytesToRec)
-
-                        if found_checksum == recChar:
-                            self.state = find_end_byte
-                        else:
-                            self.bytesRead = 0
-                            self.state = find_start_byte
-                            self.status = CRC_ERROR
-                            return self.bytesRead,
-
-                    elif self.state == find_end_byte:
-                        self.state = find_start_byte
-
-                        if recChar == STOP_BYTE:
-                            self.unpack_packet(self.bytesToRec)
-                            self.bytesRead = self.bytesToRec
-                            self.status = NEW_DATA
-                            return self.bytesRead
-
-                        self.bytesRead = 0
-                        self.status = STOP_BYTE_ERROR
-                        return self.bytesRead
-
-                    else:
-                        print('ERROR: Undefined state: {}'.format(self.state))
-
-                        self.bytesRead = 0
-                        self.state = find_start_byte
-                        return self.bytesRead
-            else:
+            needBytes = self.readHead == self.readTail or self.status in (CONTINUE, NO_DATA)
+
+            if needBytes and not self.read_into_buffer():
                 self.bytesRead = 0
                 self.status = NO_DATA
-                # return self.bytesRead
                 return self.bytesRead
 
+            return self.parse()
+
         self.bytesRead = 0
         self.status = CONTINUE
         return self.bytesRead
@@ -627,16 +828,17 @@ class SerialTransfer(object):
         :return: void
         '''
         
-        if self.available():
+        self.available()
+        if self.status == NEW_DATA:
             # EDIT
-            if self.idByte < len(self.callbacks) and self.callbacks[self.idByte]:
+            if self.callbacks.get(self.idByte):
                 self.callbacks[self.idByte]()
             elif self.debug:
                 print('ERROR: No callback available for packet ID {}'.format(self.idByte))
             
             return True
         
-        elif self.debug and not self.status:
+        elif self.debug and self.status < NO_DATA:
             if self.status == CRC_ERROR:
                 err_str = 'CRC_ERROR'
             elif self.status == PAYLOAD_ERROR:
@@ -1,28 +1,47 @@
 """Waspi components."""
 
 from waspi.components.accel_rec import AccelRecorder
+from waspi.components.aggregation import SensorAggregator
 from waspi.components.audio import PyAudioRecorder
+from waspi.components.packet_registry import PacketRegistry
+from waspi.components.payload_schema import PayloadSchema
+from waspi.components.segments import SegmentReader
 from waspi.components.sensor_manager import SerialReceiver
+from waspi.components.serial_transport import SerialFrameReader
 from waspi.components.lockfile_coordinator import LockFileCoordinator
 from waspi.components.message_factories import (
+    Deadband,
     SensorValue_MessageBuilder,
+    SensorAggregate_MessageBuilder,
     AccelLogger_MessageBuilder,
+    VibrationFeatures_MessageBuilder,
 )
 from waspi.components.messengers import MQTTMessenger
 from waspi.components.program_orchestrator import ProgramOrchestrater
 from waspi.components.waspi_util import *
 from waspi.components.message_stores.sqlite import SqliteMessageStore
 from waspi.components.stores.sqlite import SqliteStore
+from waspi.components.vibration import StreamingVibrationAnalyser, VibrationAnalyser
 
 __all__ = [
     "AccelRecorder",
+    "Deadband",
     "PyAudioRecorder",
     "LockFileCoordinator",
+    "PacketRegistry",
+    "PayloadSchema",
+    "SegmentReader",
     "SerialReceiver",
+    "SerialFrameReader",
+    "SensorAggregator",
     "SensorValue_MessageBuilder",
+    "SensorAggregate_MessageBuilder",
     "AccelLogger_MessageBuilder",
+    "VibrationFeatures_MessageBuilder",
     "MQTTMessenger",
     "ProgramOrchestrater",
     "SqliteMessageStore",
     "SqliteStore",
+    "VibrationAnalyser",
+    "StreamingVibrationAnalyser",
 ]
@@ -1,13 +1,66 @@
+import asyncio
+import collections
 import datetime
+import hashlib
+import logging
+import os
+import wave
 from pathlib import Path
-import subprocess
-import time
+from typing import Awaitable, Callable, Optional
+
 from waspi import data
-from waspi.components.types import AudioRecorder
+from waspi.components.segments import FILENAME_FORMAT, read_wav_header
+from waspi.components.trigger import StaLtaDetector
+from waspi.components.types import AsyncAudioRecorder
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_WIDTH = 2
+"""Bytes per sample of the S16_LE format recorded by arecord."""
+
+
+def describe_recording(recording: data.AccelRecording) -> data.AccelRecording:
+    """Fill the catalog fields of a recording from its WAV file.
+
+    The end, duration, samplerate, channels, size and checksum are read
+    from the file; the checksum is the MD5 of the samples.
+
+    Raises:
+        ValueError: If the file is not a 16-bit PCM WAV file.
+    """
+    path = Path(recording.path)
+    samplerate, channels, frames, data_offset = read_wav_header(path)
+
+    md5 = hashlib.md5()
+    remaining = frames * SAMPLE_WIDTH * channels
+    with open(path, "rb") as f:
+        f.seek(data_offset)
+        while remaining > 0:
+            block = f.read(min(remaining, 0x100000))
+            if not block:
+                break
+            md5.update(block)
+            remaining -= len(block)
+
+    duration = frames / samplerate
+    return recording.model_copy(
+        update=dict(
+            end=recording.datetime + datetime.timedelta(seconds=duration),
+            duration=duration,
+            samplerate=samplerate,
+            audio_channels=channels,
+            size=path.stat().st_size,
+            checksum=md5.hexdigest(),
+        )
+    )
 
 
-class AccelRecorder(AudioRecorder):
-    """An AccelRecorder that records a 2-channel audio file."""
+class AccelRecorder(AsyncAudioRecorder):
+    """An AccelRecorder that records a 2-channel audio file.
+
+    arecord runs as an asyncio subprocess, so the event loop (e.g. serial
+    ingestion) keeps running while a recording is in progress.
+    """
 
     duration: float
     """The duration of the audio file in seconds."""
@@ -21,48 +74,608 @@ class AccelRecorder(AudioRecorder):
     audio_dir: Path
     """The path of the audio file in temporary memory."""
 
+    hwid: str
+    """The hardware id of the accelerometer."""
+
+    device: str
+    """The ALSA device to record from."""
+
+    timeout: float
+    """Maximum time in seconds to wait for arecord to finish."""
+
+    settle_time: float
+    """Time in seconds to wait after a recording."""
+
     def __init__(
-        self, duration: float, samplerate: int, audio_channels: int, audio_dir: Path
+        self,
+        duration: float,
+        samplerate: int,
+        audio_channels: int,
+        audio_dir: Path,
+        hwid: str = "accel",
+        device: str = "plughw:1,0",
+        timeout: Optional[float] = None,
+        settle_time: float = 5,
     ) -> None:
-        """Initialize the AudioRecorder with the audio parameters."""
+        """Initialize the AudioRecorder with the audio parameters.
+
+        The timeout defaults to the duration plus 10 seconds.
+        """
         self.duration = duration
         self.samplerate = samplerate
         self.audio_channels = audio_channels
         self.audio_dir = audio_dir
+        self.hwid = hwid
+        self.device = device
+        self.timeout = timeout if timeout is not None else duration + 10
+        self.settle_time = settle_time
 
-    def record(self) -> data.Recording:
-        """Record an audio file using arecord."""
+    def get_path(self, started_on: datetime.datetime) -> Path:
+        """Get the path of a recording starting at the given datetime.
+
+        The name has microseconds, so recordings starting within the same
+        second, e.g. two short events, do not overwrite each other.
+        """
+        return self.audio_dir / f"{started_on.strftime(FILENAME_FORMAT)}.wav"
+
+    def get_command(self, audiofile_path: Path) -> list:
+        """Get the arecord command recording to the given path."""
+        return [
+            "arecord",
+            "-D",
+            self.device,  # Replace with the correct device ID or name
+            "--format=S16_LE",
+            f"--channels={self.audio_channels}",
+            f"--rate={self.samplerate}",
+            f"--duration={int(self.duration)}",
+            str(audiofile_path),
+        ]
+
+    async def record(self) -> Optional[data.AccelRecording]:
+        """Record an audio file using arecord.
+
+        Returns None if arecord fails or does not finish within the timeout.
+        If the coroutine is cancelled, arecord is stopped before the
+        cancellation is propagated.
+        """
         now = datetime.datetime.now()
-        audiofile_path = self.audio_dir / f'{now.strftime("%Y%m%d_%H%M%S")}.wav'
+        audiofile_path = self.get_path(now)
 
+        logger.info(f"Start accel recording: {audiofile_path}")
         try:
-            # Define the arecord command
-            arecord_command = [
-                "arecord",
-                "-D",
-                "plughw:1,0",  # Replace with the correct device ID or name
-                "--format=S16_LE",
-                f"--channels={self.audio_channels}",
-                f"--rate={self.samplerate}",
-                f"--duration={int(self.duration)}",
-                str(audiofile_path),
-            ]
-
-            # Run the command
-            print("START ACCEL - RECORDING - ARECORD")
-            subprocess.run(arecord_command, check=True)
-
-        except subprocess.CalledProcessError as e:
-            print(f"Error during recording: {e}")
+            process = await asyncio.create_subprocess_exec(
+                *self.get_command(audiofile_path),
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except OSError as e:
+            logger.error(f"Could not start arecord: {e}")
+            return None
+
+        try:
+            _, stderr = await asyncio.wait_for(
+                process.communicate(), timeout=self.timeout
+            )
+
+        except asyncio.TimeoutError:
+            logger.error(f"arecord did not finish within {self.timeout}s")
+            await self._stop(process)
             return None
 
+        except asyncio.CancelledError:
+            await self._stop(process)
+            raise
+
+        if process.returncode != 0:
+            logger.error(
+                f"Error during recording, arecord exited with "
+                f"{process.returncode}: {stderr.decode(errors='replace').strip()}"
+            )
+            return None
+
+        recording = data.AccelRecording(
+            datetime=now, hwid=self.hwid, path=audiofile_path
+        )
+        try:
+            recording = await asyncio.to_thread(describe_recording, recording)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read accel recording {audiofile_path}: {e}")
+
         # Sleep to allow data to be collected by the arduino.
-        time.sleep(5)
-
-        return data.Recording(
-            path=audiofile_path,
-            datetime=now,
-            duration=self.duration,
-            samplerate=self.samplerate,
-            audio_channels=self.audio_channels,
+        await asyncio.sleep(self.settle_time)
+
+        return recording
+
+    async def _stop(self, process: asyncio.subprocess.Process) -> None:
+        """Stop arecord, letting it close the audio file first."""
+        if process.returncode is not None:
+            return
+
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=2)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+
+class ContinuousAccelRecorder(AccelRecorder):
+    """Record the accelerometer continuously into fixed-length WAV segments.
+
+    A single arecord process streams raw samples for as long as the
+    capture runs. The stream is cut into segments of exactly
+    ``duration * samplerate`` frames, so consecutive segments are sample
+    continuous. Each segment is written under a hidden ``.part`` name and
+    renamed once complete, so a sync never picks up a partial file.
+
+    Example:
+        >>> async def on_segment(recording):
+        ...     store.store_accel_recording(recording)
+        >>> recorder = ContinuousAccelRecorder(60, 44100, 2, accel_dir)
+        >>> await recorder.capture(on_segment)
+    """
+
+    read_size: int
+    """Number of bytes read from arecord at once."""
+
+    on_samples: Optional[Callable[[memoryview], None]]
+    """Called with every block of raw samples as it is captured, e.g.
+    StreamingVibrationAnalyser.feed. It must return quickly."""
+
+    def __init__(
+        self,
+        duration: float,
+        samplerate: int,
+        audio_channels: int,
+        audio_dir: Path,
+        hwid: str = "accel",
+        device: str = "plughw:1,0",
+        read_size: int = 0x10000,
+        on_samples: Optional[Callable[[memoryview], None]] = None,
+    ) -> None:
+        """Initialize the recorder. duration is the length of a segment."""
+        super().__init__(
+            duration=duration,
+            samplerate=samplerate,
+            audio_channels=audio_channels,
+            audio_dir=audio_dir,
+            hwid=hwid,
+            device=device,
+        )
+        self.read_size = read_size
+        self.on_samples = on_samples
+
+    @property
+    def segment_frames(self) -> int:
+        """The number of frames in a segment."""
+        return round(self.duration * self.samplerate)
+
+    def get_stream_command(self) -> list:
+        """Get the arecord command streaming raw samples to stdout."""
+        return [
+            "arecord",
+            "-D",
+            self.device,
+            "-t",
+            "raw",
+            "--format=S16_LE",
+            f"--channels={self.audio_channels}",
+            f"--rate={self.samplerate}",
+            "-",
+        ]
+
+    async def capture(
+        self, on_segment: Callable[[data.AccelRecording], Awaitable[None]]
+    ) -> None:
+        """Capture continuously and pass every finalised segment to on_segment.
+
+        on_segment is called from a separate task, so a slow one does not
+        stall the reads from arecord. Returns if arecord exits, once every
+        segment is handled. When cancelled, arecord is stopped and the last,
+        shorter, segment is finalised and passed to on_segment before the
+        cancellation is propagated.
+        """
+        process, stderr_task, stderr_lines = await self._start_capture()
+        finalised, delivery_task = self._start_delivery(on_segment)
+
+        frame_size = SAMPLE_WIDTH * self.audio_channels
+        segment_size = self.segment_frames * frame_size
+        started_on = datetime.datetime.now()
+
+        segment = None
+        frames_done = 0
+
+        try:
+            while True:
+                chunk = await process.stdout.read(self.read_size)
+                if not chunk:
+                    break
+
+                view = memoryview(chunk)
+                while view:
+                    if segment is None:
+                        segment = self._open_segment(
+                            started_on
+                            + datetime.timedelta(seconds=frames_done / self.samplerate)
+                        )
+
+                    size = min(len(view), segment_size - segment.written)
+                    segment.write(view[:size])
+                    if self.on_samples is not None:
+                        self.on_samples(view[:size])
+                    view = view[size:]
+
+                    if segment.written == segment_size:
+                        frames_done += self.segment_frames
+                        finalised.put_nowait(segment.finalise())
+                        segment = None
+
+        finally:
+            await self._stop(process)
+            await stderr_task
+
+            if segment is not None and segment.written >= frame_size:
+                recording = segment.finalise()
+                logger.info(f"Finalised partial accel segment: {recording.path}")
+                finalised.put_nowait(recording)
+            elif segment is not None:
+                segment.discard()
+
+            finalised.put_nowait(None)
+            await delivery_task
+
+        self._check_exit(process, stderr_lines)
+
+    async def _start_capture(self):
+        """Start arecord streaming and the task logging its warnings."""
+        process = await asyncio.create_subprocess_exec(
+            *self.get_stream_command(),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stderr_lines: collections.deque = collections.deque(maxlen=10)
+        stderr_task = asyncio.create_task(self._read_stderr(process, stderr_lines))
+        logger.info(f"Start continuous accel capture on {self.device}")
+        return process, stderr_task, stderr_lines
+
+    @staticmethod
+    def _check_exit(process: asyncio.subprocess.Process, stderr_lines) -> None:
+        """Log an error if arecord did not exit cleanly."""
+        if process.returncode not in (0, -15):
+            logger.error(
+                f"Continuous accel capture stopped, arecord exited with "
+                f"{process.returncode}: {' / '.join(stderr_lines)}"
+            )
+
+    def _start_delivery(
+        self, on_segment: Callable[[data.AccelRecording], Awaitable[None]]
+    ):
+        """Start the task passing the finalised recordings to on_segment.
+
+        The read loop only queues the recordings, so a slow on_segment, e.g.
+        a database write, never stops reading from arecord. Queue None to
+        stop the task once the queued recordings are handled.
+        """
+        finalised: asyncio.Queue = asyncio.Queue()
+        delivery_task = asyncio.create_task(self._deliver(finalised, on_segment))
+        return finalised, delivery_task
+
+    @staticmethod
+    async def _deliver(
+        finalised: asyncio.Queue,
+        on_segment: Callable[[data.AccelRecording], Awaitable[None]],
+    ) -> None:
+        """Pass the queued recordings to on_segment in order."""
+        while True:
+            recording = await finalised.get()
+            if recording is None:
+                return
+
+            try:
+                await on_segment(recording)
+            except Exception as e:
+                logger.error(f"Error handling accel recording {recording.path}: {e}")
+
+    def _open_segment(self, started_on: datetime.datetime) -> "_Segment":
+        """Open a new segment starting at the given datetime."""
+        return _Segment(self, self.get_path(started_on), started_on)
+
+    @staticmethod
+    async def _read_stderr(process: asyncio.subprocess.Process, lines) -> None:
+        """Log the arecord warnings, e.g. overruns, and keep the last lines."""
+        async for line in process.stderr:
+            line = line.decode(errors="replace").strip()
+            if line:
+                lines.append(line)
+                logger.warning(f"arecord: {line}")
+
+
+class TriggeredAccelRecorder(ContinuousAccelRecorder):
+    """Record the accelerometer only around vibration events.
+
+    arecord streams continuously as for ContinuousAccelRecorder, but the
+    samples are only kept in an in-memory pre-roll ring buffer until the
+    StaLtaDetector triggers. A recording then starts pre_roll seconds
+    before the trigger and ends post_roll seconds after the detector
+    releases. A trigger during the post-roll extends the same recording,
+    so overlapping events are merged. Recordings are cut at duration
+    seconds: an event still triggered continues, without a gap, in the
+    next recording, otherwise its post-roll is cut short.
+
+    Example:
+        >>> recorder = TriggeredAccelRecorder(60, 44100, 2, accel_dir, pre_roll=5)
+        >>> await recorder.capture(on_segment)
+    """
+
+    pre_roll: float
+    """Seconds of audio kept before the first trigger of an event."""
+
+    post_roll: float
+    """Seconds of audio kept after the last release of an event."""
+
+    block_duration: float
+    """Length in seconds of the blocks passed to the detector."""
+
+    detector: StaLtaDetector
+    """The detector deciding which blocks are recorded."""
+
+    def __init__(
+        self,
+        duration: float,
+        samplerate: int,
+        audio_channels: int,
+        audio_dir: Path,
+        hwid: str = "accel",
+        device: str = "plughw:1,0",
+        read_size: int = 0x10000,
+        on_samples: Optional[Callable[[memoryview], None]] = None,
+        pre_roll: float = 5,
+        post_roll: float = 5,
+        block_duration: float = 0.1,
+        detector: Optional[StaLtaDetector] = None,
+    ) -> None:
+        """Initialize the recorder. duration is the longest recording.
+
+        The detector defaults to a StaLtaDetector over the whole band.
+        """
+        super().__init__(
+            duration=duration,
+            samplerate=samplerate,
+            audio_channels=audio_channels,
+            audio_dir=audio_dir,
+            hwid=hwid,
+            device=device,
+            read_size=read_size,
+            on_samples=on_samples,
+        )
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.block_duration = block_duration
+        self.detector = (
+            detector
+            if detector is not None
+            else StaLtaDetector(samplerate, audio_channels)
+        )
+
+    @property
+    def block_frames(self) -> int:
+        """The number of frames in a detector block."""
+        return max(1, round(self.block_duration * self.samplerate))
+
+    async def capture(
+        self, on_segment: Callable[[data.AccelRecording], Awaitable[None]]
+    ) -> None:
+        """Capture continuously and pass every finalised event to on_segment.
+
+        Returns if arecord exits. When cancelled, arecord is stopped and the
+        event in progress is finalised and passed to on_segment before the
+        cancellation is propagated.
+        """
+        process, stderr_task, stderr_lines = await self._start_capture()
+        finalised, delivery_task = self._start_delivery(on_segment)
+
+        frame_size = SAMPLE_WIDTH * self.audio_channels
+        block_size = self.block_frames * frame_size
+        segment_size = self.segment_frames * frame_size
+        block_delta = datetime.timedelta(seconds=self.block_frames / self.samplerate)
+        post_roll_blocks = round(self.post_roll / self.block_duration)
+        started_on = datetime.datetime.now()
+
+        ring: collections.deque = collections.deque(
+            maxlen=round(self.pre_roll / self.block_duration)
+        )
+        pending = bytearray()
+        blocks_done = 0
+        event = None
+        self.detector.reset()
+
+        try:
+            while True:
+                chunk = await process.stdout.read(self.read_size)
+                if not chunk:
+                    break
+
+                pending += chunk
+                while len(pending) >= block_size:
+                    block = bytes(pending[:block_size])
+                    del pending[:block_size]
+                    block_start = started_on + blocks_done * block_delta
+                    blocks_done += 1
+
+                    triggered = self.detector.update(block)
+                    if event is None:
+                        if not triggered:
+                            ring.append(block)
+                            continue
+
+                        event = _Event(
+                            self._open_segment(block_start - len(ring) * block_delta),
+                            triggered_on=block_start,
+                            post_roll_blocks=post_roll_blocks,
+                        )
+                        while ring:
+                            self._write(event.segment, ring.popleft())
+
+                    event.update(triggered, self.detector.ratio, block_start)
+                    self._write(event.segment, block)
+
+                    if event.done:
+                        finalised.put_nowait(
+                            event.finalise(self, block_start + block_delta)
+                        )
+                        event = None
+
+                    elif event.segment.written >= segment_size:
+                        # An active event goes on in the next, contiguous,
+                        # recording, the post-roll of a released one is cut
+                        recording = event.finalise(self, block_start + block_delta)
+                        event = (
+                            event.carry_over(
+                                self._open_segment(block_start + block_delta)
+                            )
+                            if event.active
+                            else None
+                        )
+                        finalised.put_nowait(recording)
+
+        finally:
+            await self._stop(process)
+            await stderr_task
+
+            if event is not None:
+                recording = event.finalise(
+                    self, started_on + blocks_done * block_delta
+                )
+                logger.info(f"Finalised partial accel event: {recording.path}")
+                finalised.put_nowait(recording)
+
+            finalised.put_nowait(None)
+            await delivery_task
+
+        self._check_exit(process, stderr_lines)
+
+    def _write(self, segment: "_Segment", block: bytes) -> None:
+        """Write a block to the segment and pass it to on_samples."""
+        segment.write(block)
+        if self.on_samples is not None:
+            self.on_samples(block)
+
+
+class _Event:
+    """An accelerometer event being recorded into a segment."""
+
+    def __init__(
+        self,
+        segment: "_Segment",
+        triggered_on: datetime.datetime,
+        post_roll_blocks: int,
+        active: bool = False,
+    ) -> None:
+        self.segment = segment
+        self.triggered_on = triggered_on
+        self.released_on = triggered_on
+        self.post_roll_blocks = post_roll_blocks
+        self.remaining = post_roll_blocks
+        self.active = active
+        self.peak_ratio = 0.0
+        self.triggers = 0
+
+    @property
+    def done(self) -> bool:
+        """Whether the post-roll after the last release is complete."""
+        return not self.active and self.remaining <= 0
+
+    def update(
+        self, triggered: bool, ratio: float, block_start: datetime.datetime
+    ) -> None:
+        """Update the event with the detector state of the next block."""
+        self.peak_ratio = max(self.peak_ratio, ratio)
+
+        if triggered:
+            if not self.active:
+                self.triggers += 1
+            self.active = True
+            self.remaining = self.post_roll_blocks
+
+        else:
+            if self.active:
+                self.released_on = block_start
+            self.active = False
+            self.remaining -= 1
+
+    def finalise(
+        self, recorder: TriggeredAccelRecorder, ended_on: datetime.datetime
+    ) -> data.AccelRecording:
+        """Finalise the segment as a recording with the trigger metadata."""
+        if self.active:
+            self.released_on = ended_on
+
+        recording = self.segment.finalise()
+        recording.trigger = data.AccelTrigger(
+            triggered_on=self.triggered_on,
+            released_on=self.released_on,
+            peak_ratio=round(self.peak_ratio, 2),
+            triggers=self.triggers,
+            pre_roll=(self.triggered_on - self.segment.started_on).total_seconds(),
+            post_roll=(ended_on - self.released_on).total_seconds(),
+        )
+        return recording
+
+    def carry_over(self, segment: "_Segment") -> "_Event":
+        """Continue the active event in a new segment."""
+        event = _Event(
+            segment,
+            triggered_on=segment.started_on,
+            post_roll_blocks=self.post_roll_blocks,
+            active=True,
+        )
+        event.triggers = 1
+        return event
+
+
+class _Segment:
+    """A WAV segment being written under a temporary name."""
+
+    def __init__(
+        self, recorder: ContinuousAccelRecorder, path: Path, started_on: datetime.datetime
+    ) -> None:
+        self.recorder = recorder
+        self.path = path
+        self.tmp_path = path.with_name(f".{path.name}.part")
+        self.started_on = started_on
+        self.written = 0
+        self.md5 = hashlib.md5()
+        self.wav = wave.open(str(self.tmp_path), "wb")
+        self.wav.setnchannels(recorder.audio_channels)
+        self.wav.setsampwidth(SAMPLE_WIDTH)
+        self.wav.setframerate(recorder.samplerate)
+
+    def write(self, samples) -> None:
+        """Append raw samples to the segment."""
+        self.wav.writeframesraw(samples)
+        self.md5.update(samples)
+        self.written += len(samples)
+
+    def finalise(self) -> data.AccelRecording:
+        """Close the segment and move it to its final name atomically."""
+        self.wav.close()
+        os.replace(self.tmp_path, self.path)
+
+        channels = self.recorder.audio_channels
+        duration = self.written // (SAMPLE_WIDTH * channels) / self.recorder.samplerate
+        return data.AccelRecording(
+            datetime=self.started_on,
+            hwid=self.recorder.hwid,
+            path=self.path,
+            end=self.started_on + datetime.timedelta(seconds=duration),
+            duration=duration,
+            samplerate=self.recorder.samplerate,
+            audio_channels=channels,
+            size=self.path.stat().st_size,
+            checksum=self.md5.hexdigest(),
         )
+
+    def discard(self) -> None:
+        """Close and delete an empty segment."""
+        self.wav.close()
+        self.tmp_path.unlink(missing_ok=True)
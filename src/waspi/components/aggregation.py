@@ -0,0 +1,191 @@
+"""Incremental windowed aggregation of sensor streams."""
+
+import datetime
+import math
+from typing import List, Optional, Sequence
+
+from waspi import data
+
+__all__ = [
+    "DEFAULT_WINDOWS",
+    "RunningStats",
+    "SensorAggregator",
+    "WindowAggregator",
+]
+
+DEFAULT_WINDOWS = (10, 60, 600)
+"""Default aggregation windows in seconds: 10 s, 1 min and 10 min."""
+
+
+class RunningStats:
+    """Running statistics of a single sensor, updated in O(1) per value.
+
+    The mean and variance are updated with Welford's algorithm, so no
+    value has to be kept once it has been added.
+    """
+
+    __slots__ = ("count", "min", "max", "mean", "m2", "last")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.last = math.nan
+
+    def add(self, value: float) -> None:
+        """Add a value to the statistics."""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.last = value
+
+    @property
+    def std(self) -> float:
+        """The population standard deviation of the values."""
+        if self.count == 0:
+            return math.nan
+        return math.sqrt(self.m2 / self.count)
+
+    def to_aggregate(self, hwid: str, decimals: int = 3) -> data.SensorAggregate:
+        """Build the SensorAggregate of the statistics."""
+        return data.SensorAggregate(
+            hwid=hwid,
+            count=self.count,
+            min=round(self.min, decimals),
+            max=round(self.max, decimals),
+            mean=round(self.mean, decimals),
+            std=round(self.std, decimals),
+            last=round(self.last, decimals),
+        )
+
+
+class WindowAggregator:
+    """Aggregate sensor frames over fixed, non-overlapping time windows.
+
+    Windows are aligned on multiples of their length in unix time, so a
+    60 s window always starts on the minute. A window is closed by the
+    first frame received after its end, and windows without frames are
+    not emitted.
+
+    Example:
+        >>> aggregator = WindowAggregator(hwid_list, window=60)
+        >>> async for sensor_frame in receiver.frames():
+        ...     aggregate = aggregator.add(sensor_frame)
+        ...     if aggregate is not None:
+        ...         print(aggregate)
+    """
+
+    hwids: Sequence[str]
+    """The sensor hardware ids, in the order of the frame values."""
+
+    window: float
+    """The length of the window in seconds."""
+
+    start: Optional[float]
+    """The unix time at which the current window started."""
+
+    def __init__(self, hwids: Sequence[str], window: float) -> None:
+        """Initialise the aggregator with an empty window."""
+        if window <= 0:
+            raise ValueError(f"Window must be positive, got {window}.")
+
+        self.hwids = hwids
+        self.window = window
+        self.start = None
+        self.stats: List[RunningStats] = []
+
+    @property
+    def end(self) -> Optional[float]:
+        """The unix time at which the current window ends."""
+        if self.start is None:
+            return None
+        return self.start + self.window
+
+    def add(self, frame: data.SensorFrame) -> Optional[data.AggregateOutput]:
+        """Add a frame to the current window.
+
+        Returns:
+            The aggregate of the previous window if the frame closed it,
+            otherwise None.
+        """
+        closed = None
+
+        if self.start is None or frame.received_on >= self.end:
+            closed = self.flush()
+            self.start = frame.received_on - frame.received_on % self.window
+            self.stats = [RunningStats() for _ in self.hwids]
+
+        # A frame older than the window start (e.g. after a clock change) is
+        # counted in the current window rather than reopening a closed one.
+        for stats, value in zip(self.stats, frame.values):
+            stats.add(value)
+
+        return closed
+
+    def flush(self) -> Optional[data.AggregateOutput]:
+        """Close the current window and return its aggregate.
+
+        Returns None if no frame was added to the window.
+        """
+        if self.start is None or not self.stats or self.stats[0].count == 0:
+            return None
+
+        aggregate = data.AggregateOutput(
+            window=self.window,
+            start=datetime.datetime.fromtimestamp(self.start),
+            end=datetime.datetime.fromtimestamp(self.end),
+            content={
+                hwid: stats.to_aggregate(hwid)
+                for hwid, stats in zip(self.hwids, self.stats)
+            },
+        )
+        self.start = None
+        self.stats = []
+        return aggregate
+
+
+class SensorAggregator:
+    """Aggregate sensor frames over several windows at once.
+
+    Example:
+        >>> aggregator = SensorAggregator(hwid_list, windows=(10, 60, 600))
+        >>> for aggregate in aggregator.add(sensor_frame):
+        ...     print(aggregate.window, aggregate.content)
+    """
+
+    def __init__(
+        self, hwids: Sequence[str], windows: Sequence[float] = DEFAULT_WINDOWS
+    ) -> None:
+        """Initialise one WindowAggregator for each window."""
+        self.hwids = hwids
+        self.aggregators = [WindowAggregator(hwids, window) for window in windows]
+
+    def add(self, frame: data.SensorFrame) -> List[data.AggregateOutput]:
+        """Add a frame to every window and return the windows it closed."""
+        closed = []
+
+        for aggregator in self.aggregators:
+            aggregate = aggregator.add(frame)
+            if aggregate is not None:
+                closed.append(aggregate)
+
+        return closed
+
+    def flush(self) -> List[data.AggregateOutput]:
+        """Close every window and return their aggregates."""
+        closed = []
+
+        for aggregator in self.aggregators:
+            aggregate = aggregator.flush()
+            if aggregate is not None:
+                closed.append(aggregate)
+
+        return closed
@@ -1,16 +1,92 @@
 """AudioRecorder using USB Microphone for waspi."""
 import datetime
+import logging
+import threading
 import wave
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 import pyaudio
 
 from waspi import data
 from waspi.components.types import AudioRecorder
 
+logger = logging.getLogger(__name__)
+
+
+class ChunkRing:
+    """A preallocated ring of audio chunks.
+
+    The PortAudio callback thread puts chunks in the ring and the recording
+    thread takes them out, so no memory is allocated while recording. When
+    the ring is full, new chunks are dropped and counted.
+    """
+
+    def __init__(self, chunk_bytes: int, num_chunks: int) -> None:
+        """Allocate the ring for num_chunks chunks of chunk_bytes bytes."""
+        self.chunk_bytes = chunk_bytes
+        self.num_chunks = num_chunks
+        self.buffer = bytearray(chunk_bytes * num_chunks)
+        self.view = memoryview(self.buffer)
+        self.sizes = [0] * num_chunks
+        self.head = 0
+        self.tail = 0
+        self.count = 0
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.filled = threading.Semaphore(0)
+
+    def clear(self) -> None:
+        """Empty the ring and reset the dropped counter."""
+        with self.lock:
+            self.head = self.tail = self.count = self.dropped = 0
+            self.filled = threading.Semaphore(0)
+
+    def put(self, chunk: bytes) -> bool:
+        """Copy a chunk into the ring. Returns False if it was dropped."""
+        with self.lock:
+            if self.count == self.num_chunks:
+                self.dropped += 1
+                return False
+            slot = self.head
+
+        size = min(len(chunk), self.chunk_bytes)
+        start = slot * self.chunk_bytes
+        self.view[start : start + size] = chunk[:size]
+        self.sizes[slot] = size
+
+        with self.lock:
+            self.head = (slot + 1) % self.num_chunks
+            self.count += 1
+        self.filled.release()
+        return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[memoryview]:
+        """Wait for the oldest chunk. Call release once it has been used.
+
+        Returns None if no chunk arrived within the timeout.
+        """
+        if not self.filled.acquire(timeout=timeout):
+            return None
+
+        start = self.tail * self.chunk_bytes
+        return self.view[start : start + self.sizes[self.tail]]
+
+    def release(self) -> None:
+        """Free the chunk returned by the last call to get."""
+        with self.lock:
+            self.tail = (self.tail + 1) % self.num_chunks
+            self.count -= 1
+
+
 class PyAudioRecorder(AudioRecorder):
-    """An AudioRecorder that records a 3 second audio file."""
+    """An AudioRecorder that records a 3 second audio file.
+
+    A single PyAudio instance and input stream are kept open between
+    recordings. The stream runs in callback mode and its chunks go through
+    a preallocated ChunkRing straight into the wave file, so memory use
+    does not depend on the duration.
+    """
 
     duration: float
     """The duration of the audio file in seconds."""
@@ -30,6 +106,16 @@ class PyAudioRecorder(AudioRecorder):
     audio_dir: Path
     """The path of the audio file in temporary memory."""
 
+    overflows: int
+    """Number of chunks flagged by PortAudio as input overflow."""
+
+    dropped_chunks: int
+    """Number of chunks dropped because the ring buffer was full."""
+
+    on_samples: Optional[Callable[[bytes], None]]
+    """Called with every chunk of raw samples as it is recorded, e.g.
+    StreamingVibrationAnalyser.feed. It must return quickly."""
+
     def __init__(
         self,
         duration: float,
@@ -38,8 +124,14 @@ class PyAudioRecorder(AudioRecorder):
         device_name: str,
         chunksize: int,
         audio_dir: Path,
+        buffer_seconds: float = 2,
+        on_samples: Optional[Callable[[bytes], None]] = None,
     ) -> None:
-        """Initialise the AudioRecorder with the audio parameters."""
+        """Initialise the AudioRecorder with the audio parameters.
+
+        buffer_seconds sets how much audio the ring buffer holds if writing
+        the file falls behind.
+        """
         # Audio Duration
         self.duration = duration
 
@@ -52,6 +144,18 @@ class PyAudioRecorder(AudioRecorder):
         self.chunksize = chunksize
         self.audio_dir = audio_dir
         self.sample_width = pyaudio.get_sample_size(pyaudio.paInt16)
+        self.frame_size = self.sample_width * self.audio_channels
+
+        # Long-lived PyAudio instance, the stream is opened on first use
+        self.pyaudio = pyaudio.PyAudio()
+        self.stream = None
+        self.ring = ChunkRing(
+            chunk_bytes=self.chunksize * self.frame_size,
+            num_chunks=max(2, int(buffer_seconds * samplerate / chunksize)),
+        )
+        self.overflows = 0
+        self.dropped_chunks = 0
+        self.on_samples = on_samples
 
         #if self.device_index is None:
             # Get the index of the audio device
@@ -60,29 +164,20 @@ class PyAudioRecorder(AudioRecorder):
 
     def get_device_index(self) -> int:
         """Get the index of the audio device."""
-        # Create an instance of PyAudio
-        p = pyaudio.PyAudio()
-    
         # Get the number of audio devices
-        num_devices = p.get_device_count()
-        
+        num_devices = self.pyaudio.get_device_count()
+
         # Loop through the audio devices
         for i in range(num_devices):
-            print(f"Device Number: {i}")
             # Get the audio device info
-            device_info = p.get_device_info_by_index(i)
-            print(f"DEVICE INFO: {device_info}")
+            device_info = self.pyaudio.get_device_info_by_index(i)
+            logger.debug(f"Device {i}: {device_info}")
             # Check if the audio device is an input device
             if not self.device_name in str(device_info["name"]):
                 continue
 
-            else:
-                # Get the index of the USB audio device
-                #print(f"DEVICE INDEX: {device_info['index']}")
-                device_index = int(device_info["index"])
-                #print(f"RETURN DEVICE_INDEX: {device_index}")
-            
-            return device_index
+            # Get the index of the USB audio device
+            return int(device_info["index"])
 
         raise ValueError("No USB audio device found")
 
@@ -93,8 +188,13 @@ class PyAudioRecorder(AudioRecorder):
         """
         now = datetime.datetime.now()
         audiofile_path = self.audio_dir / f'{now.strftime("%Y%m%d_%H%M%S")}.wav'
-        frames = self.get_recording_data(duration=self.duration)
-        self.save_recording(frames, audiofile_path)
+
+        with wave.open(str(audiofile_path), "wb") as audio_file:
+            audio_file.setnchannels(self.audio_channels)
+            audio_file.setsampwidth(self.sample_width)
+            audio_file.setframerate(self.samplerate)
+            self.stream_to(audio_file.writeframesraw, self.duration)
+
         return data.Recording(
             path=audiofile_path,
             datetime=now,
@@ -104,41 +204,82 @@ class PyAudioRecorder(AudioRecorder):
             chunksize=self.chunksize,
         )
 
+    def stream_to(self, write, duration: float) -> int:
+        """Capture duration seconds of audio and pass the chunks to write.
+
+        Input overflows and dropped chunks are counted and logged instead
+        of aborting the recording.
+
+        Returns:
+            The number of frames captured.
+
+        Raises:
+            OSError: If the device stops delivering audio.
+        """
+        remaining = int(duration * self.samplerate) * self.frame_size
+        chunk_timeout = 1 + 2 * self.chunksize / self.samplerate
+        overflows = self.overflows
+
+        self.ring.clear()
+        self._start_stream()
+
+        try:
+            while remaining > 0:
+                chunk = self.ring.get(timeout=chunk_timeout)
+                if chunk is None:
+                    raise OSError(f"No audio received from {self.device_name}")
+
+                try:
+                    write(chunk[:remaining])
+                    if self.on_samples is not None:
+                        # The ring slot is reused, pass a copy
+                        self.on_samples(bytes(chunk[:remaining]))
+                    remaining -= min(len(chunk), remaining)
+                finally:
+                    self.ring.release()
+
+        finally:
+            self.stream.stop_stream()
+            self.dropped_chunks += self.ring.dropped
+
+        if self.overflows > overflows or self.ring.dropped:
+            logger.warning(
+                f"Recording had {self.overflows - overflows} input overflows "
+                f"and {self.ring.dropped} dropped chunks."
+            )
+
+        return int(duration * self.samplerate)
+
     def get_recording_data(
         self,
         duration: Optional[float] = None,
         num_chunks: Optional[int] = None,
-    ) -> bytes:
+    ) -> bytearray:
+        """Capture audio into memory.
+
+        The samples are written into a single preallocated buffer, which is
+        returned as is to avoid copying the recording.
+        """
         if num_chunks is None:
             if duration is None:
                 raise ValueError("duration or num_chunks must be provided")
 
-            num_chunks = int(duration * self.samplerate / self.chunksize)
-
-        p = pyaudio.PyAudio()
+        else:
+            duration = max(num_chunks, 1) * self.chunksize / self.samplerate
 
-        stream = p.open(
-            format=pyaudio.paInt16,
-            channels=self.audio_channels,
-            rate=self.samplerate,
-            input=True,
-            frames_per_buffer=self.chunksize,
-            input_device_index=self.device_index,
-        )
-
-        frames = []
-        for _ in range(0, num_chunks if num_chunks > 0 else 1):
-            audio_data = stream.read(
-                self.chunksize,
-                exception_on_overflow=True,
-            )
-            frames.append(audio_data)
+        # Preallocate the whole recording instead of joining chunks
+        buffer = bytearray(int(duration * self.samplerate) * self.frame_size)
+        view = memoryview(buffer)
+        position = 0
 
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
+        def write(chunk):
+            nonlocal position
+            view[position : position + len(chunk)] = chunk
+            position += len(chunk)
 
-        return b"".join(frames)
+        self.stream_to(write, duration)
+        view.release()
+        return buffer
 
     def save_recording(self, data: bytes, path: Path) -> None:
         """Save the recording to a file."""
@@ -148,3 +289,31 @@ class PyAudioRecorder(AudioRecorder):
             audio_file.setframerate(self.samplerate)
             audio_file.writeframes(data)
 
+    def close(self) -> None:
+        """Close the stream and release PyAudio."""
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        self.pyaudio.terminate()
+
+    def _start_stream(self) -> None:
+        """Open the input stream on first use and start it."""
+        if self.stream is None:
+            self.stream = self.pyaudio.open(
+                format=pyaudio.paInt16,
+                channels=self.audio_channels,
+                rate=self.samplerate,
+                input=True,
+                frames_per_buffer=self.chunksize,
+                input_device_index=self.device_index,
+                stream_callback=self._on_audio,
+                start=False,
+            )
+        self.stream.start_stream()
+
+    def _on_audio(self, in_data, frame_count, time_info, status_flags):
+        """PortAudio callback: queue the chunk for the recording thread."""
+        if status_flags & pyaudio.paInputOverflow:
+            self.overflows += 1
+        self.ring.put(in_data)
+        return (None, pyaudio.paContinue)
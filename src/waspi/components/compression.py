@@ -0,0 +1,184 @@
+"""Lossless FLAC compression of finished recordings."""
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Set
+
+from waspi import data
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "FlacCompressor",
+]
+
+
+class FlacCompressor:
+    """Compress finished WAV recordings to FLAC in the background.
+
+    Each recording is encoded by a separate ``flac`` process, with at most
+    max_workers running at once. The output is written under a hidden
+    ``.part`` name, decoded back with ``flac --test`` to check it against
+    the MD5 of the original samples, and only then renamed into place and
+    the WAV deleted.
+
+    Example:
+        >>> compressor = FlacCompressor(max_workers=2)
+        >>> compressor.submit(recording, on_compressed)
+        >>> await compressor.join()
+    """
+
+    max_workers: int
+    """Maximum number of recordings compressed at once."""
+
+    compression_level: int
+    """The flac compression level, from 0 (fastest) to 8 (smallest)."""
+
+    delete_source: bool
+    """Whether to delete the WAV once the FLAC file is verified."""
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        compression_level: int = 5,
+        delete_source: bool = True,
+        niceness: int = 10,
+    ) -> None:
+        """Initialise the compressor.
+
+        The flac processes run with the given niceness so they do not take
+        CPU time from the recording and serial processes.
+        """
+        self.max_workers = max_workers
+        self.compression_level = compression_level
+        self.delete_source = delete_source
+        self.niceness = niceness
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        """Number of recordings waiting for or being compressed."""
+        return len(self._pending)
+
+    def submit(
+        self,
+        recording: data.AccelRecording,
+        on_compressed: Optional[
+            Callable[[data.AccelCompression], Awaitable[None]]
+        ] = None,
+    ) -> None:
+        """Queue a recording for compression.
+
+        on_compressed is awaited with the result once the recording has been
+        compressed and verified.
+        """
+        task = asyncio.create_task(self._compress_and_notify(recording, on_compressed))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def join(self) -> None:
+        """Wait until every submitted recording has been compressed."""
+        while self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    async def cancel(self) -> None:
+        """Cancel the pending compressions, keeping their WAV files."""
+        for task in list(self._pending):
+            task.cancel()
+        await asyncio.gather(*self._pending, return_exceptions=True)
+
+    async def compress(
+        self, recording: data.AccelRecording
+    ) -> Optional[data.AccelCompression]:
+        """Compress a recording to FLAC next to the WAV file.
+
+        Returns None if the recording could not be compressed or verified,
+        in which case the WAV file is kept.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        wav_path = Path(recording.path)
+        flac_path = wav_path.with_suffix(".flac")
+        tmp_path = flac_path.with_name(f".{flac_path.name}.part")
+
+        async with self._semaphore:
+            try:
+                await self._run_flac(
+                    f"-{self.compression_level}",
+                    "--verify",
+                    "--force",
+                    "-o",
+                    str(tmp_path),
+                    str(wav_path),
+                )
+                await self._run_flac("--test", str(tmp_path))
+
+            except (OSError, RuntimeError) as e:
+                logger.error(f"Could not compress {wav_path}: {e}")
+                tmp_path.unlink(missing_ok=True)
+                return None
+
+            except asyncio.CancelledError:
+                tmp_path.unlink(missing_ok=True)
+                raise
+
+        original_size = wav_path.stat().st_size
+        compressed_size = tmp_path.stat().st_size
+        os.replace(tmp_path, flac_path)
+
+        if self.delete_source:
+            wav_path.unlink()
+
+        compression = data.AccelCompression(
+            recording_id=recording.id,
+            path=flac_path,
+            original_size=original_size,
+            compressed_size=compressed_size,
+            compression_ratio=round(compressed_size / original_size, 4),
+        )
+        logger.info(
+            f"Compressed {wav_path.name} to {flac_path.name} "
+            f"({compression.compression_ratio:.0%} of the original size)"
+        )
+        return compression
+
+    async def _compress_and_notify(self, recording, on_compressed) -> None:
+        """Compress a recording and pass the result to on_compressed."""
+        compression = await self.compress(recording)
+
+        if compression is not None and on_compressed is not None:
+            await on_compressed(compression)
+
+    async def _run_flac(self, *args: str) -> None:
+        """Run flac with the given arguments.
+
+        Raises:
+            RuntimeError: If flac exits with an error.
+        """
+        process = await asyncio.create_subprocess_exec(
+            "nice",
+            "-n",
+            str(self.niceness),
+            "flac",
+            "--silent",
+            *args,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+
+        try:
+            _, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+
+        if process.returncode != 0:
+            raise RuntimeError(
+                f"flac exited with {process.returncode}: "
+                f"{stderr.decode(errors='replace').strip()}"
+            )
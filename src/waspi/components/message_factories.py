@@ -1,11 +1,41 @@
 """Message factories for waspi."""
 
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+
 from waspi import data
 from waspi.components.types import (
     SerialOutputMessageBuilder,
+    AggregateOutputMessageBuilder,
     AccelRecordingMessageBuilder,
+    VibrationFeaturesMessageBuilder,
 )
 
+logger = logging.getLogger(__name__)
+
+
+class Deadband(NamedTuple):
+    """How much a sensor value must change before it is sent again."""
+
+    absolute: float = 0.0
+    """Change in the sensor unit, e.g. 0.2 for 0.2 degC."""
+
+    relative: float = 0.0
+    """Change as a fraction of the last sent value, e.g. 0.01 for 1%."""
+
+    def exceeded(self, value: float, last_value: float) -> bool:
+        """Whether value is outside the deadband around the last sent value."""
+        return abs(value - last_value) > max(
+            self.absolute, self.relative * abs(last_value)
+        )
+
+
+DeadbandSpec = Union[Deadband, Tuple[float, float], float]
+"""A Deadband, an (absolute, relative) tuple or an absolute deadband."""
+
 
 class SensorValue_MessageBuilder(SerialOutputMessageBuilder):
     """A SerialOutput MessageBuilder that builds message from serial outputs.
@@ -15,14 +45,144 @@ class SensorValue_MessageBuilder(SerialOutputMessageBuilder):
             'hwid': hardware sensor id,
             'value': value of the sensors,
         }
+
+    By default every sensor value is sent. If deadbands or max_silence are
+    given, the builder reports by exception: a sensor is only included when
+    its value moved outside its deadband since it was last sent, or when it
+    has not been sent for max_silence seconds. build_message returns None
+    when no sensor has to be sent. Once the message has been delivered,
+    mark_sent records the values as sent; until then they are sent again
+    with the next report. The last sent value of each sensor is saved to
+    state_path, so a restart does not send every sensor again.
     """
 
-    async def build_message(self, serial_output: data.SerialOutput) -> data.Message:
+    deadbands: Dict[str, Deadband]
+    """The deadband of each hwid."""
+
+    default_deadband: Deadband
+    """The deadband of hwids missing from deadbands."""
+
+    max_silence: Optional[float]
+    """Maximum time in seconds between two sends of a sensor."""
+
+    state_path: Optional[Path]
+    """Path to the JSON file keeping the last sent values."""
+
+    def __init__(
+        self,
+        deadbands: Optional[Dict[str, DeadbandSpec]] = None,
+        default_deadband: DeadbandSpec = Deadband(),
+        max_silence: Optional[float] = None,
+        state_path: Optional[Path] = None,
+    ) -> None:
+        """Initialise the builder and load the last sent values."""
+        self.report_by_exception = deadbands is not None or max_silence is not None
+        self.deadbands = {
+            hwid: self._to_deadband(spec) for hwid, spec in (deadbands or {}).items()
+        }
+        self.default_deadband = self._to_deadband(default_deadband)
+        self.max_silence = max_silence
+        self.state_path = Path(state_path) if state_path is not None else None
+        self.last_sent: Dict[str, Tuple[float, float]] = self._load_state()
+
+    @staticmethod
+    def _to_deadband(spec: DeadbandSpec) -> Deadband:
+        """Build a Deadband from its specification."""
+        if isinstance(spec, (int, float)):
+            return Deadband(absolute=spec)
+        return Deadband(*spec)
+
+    async def build_message(
+        self, serial_output: data.SerialOutput
+    ) -> Optional[data.Message]:
         """Build a message from a list of sensor values (Serial Output)."""
+        if self.report_by_exception:
+            serial_output = self.filter_changed(serial_output)
+            if not serial_output.content:
+                return None
+
         # json_string = json.dumps(serial_output.dict())
         json_string = serial_output.model_dump_json()
         return data.Message(content=json_string)
 
+    def mark_sent(self, serial_output: data.SerialOutput) -> None:
+        """Record the sensor values of a delivered message as sent.
+
+        serial_output is the report the message was built from.
+        """
+        if not self.report_by_exception:
+            return
+
+        changed = self.filter_changed(serial_output).content
+        for hwid, sensor_value in changed.items():
+            self.last_sent[hwid] = (sensor_value.value, sensor_value.timestamp)
+
+        if changed:
+            self._save_state()
+
+    def filter_changed(self, serial_output: data.SerialOutput) -> data.SerialOutput:
+        """Keep the sensor values that have to be sent."""
+        changed = {}
+
+        for hwid, sensor_value in serial_output.content.items():
+            last = self.last_sent.get(hwid)
+
+            if (
+                last is None
+                or self.deadbands.get(hwid, self.default_deadband).exceeded(
+                    sensor_value.value, last[0]
+                )
+                or (
+                    self.max_silence is not None
+                    and sensor_value.timestamp - last[1] >= self.max_silence
+                )
+            ):
+                changed[hwid] = sensor_value
+
+        return serial_output.model_copy(update={"content": changed})
+
+    def _load_state(self) -> Dict[str, Tuple[float, float]]:
+        """Load the last sent values saved by a previous run."""
+        if self.state_path is None or not self.state_path.exists():
+            return {}
+
+        try:
+            with open(self.state_path) as f:
+                return {hwid: tuple(last) for hwid, last in json.load(f).items()}
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Could not load report state {self.state_path}: {e}")
+            return {}
+
+    def _save_state(self) -> None:
+        """Save the last sent values, replacing the file atomically."""
+        if self.state_path is None:
+            return
+
+        tmp_path = self.state_path.with_suffix(self.state_path.suffix + ".tmp")
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.last_sent, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.warning(f"Could not save report state {self.state_path}: {e}")
+
+
+class SensorAggregate_MessageBuilder(AggregateOutputMessageBuilder):
+    """An AggregateOutput MessageBuilder that builds message from the sensor
+    statistics of a closed window. Format Result for with the following arguments:
+       {
+            'window': length of the window in seconds,
+            'start': datetime when the window started,
+            'end': datetime when the window ended,
+            'content': count, min, max, mean, std and last value of each hwid,
+        }
+    """
+
+    async def build_message(self, aggregate_output: data.AggregateOutput) -> data.Message:
+        """Build a message from the sensor statistics of a window."""
+        json_string = aggregate_output.model_dump_json()
+        return data.Message(content=json_string)
+
 
 class AccelLogger_MessageBuilder(AccelRecordingMessageBuilder):
     """A AccelLogger MessageBuilder that builds message when an accelerometer recording
@@ -31,6 +191,7 @@ class AccelLogger_MessageBuilder(AccelRecordingMessageBuilder):
             'datetime': recording datetime of the accelerometer,
             'hwid': hardware sensor id,
             'path': path to the recordings,
+            'trigger': trigger of an event-triggered recording, or null,
         }
     """
 
@@ -39,3 +200,23 @@ class AccelLogger_MessageBuilder(AccelRecordingMessageBuilder):
         """Build a message from a list of sensor values (Serial Output)."""
         json_string = accel_logger.model_dump_json()
         return data.Message(content=json_string)
+
+
+class VibrationFeatures_MessageBuilder(VibrationFeaturesMessageBuilder):
+    """A VibrationFeatures MessageBuilder that builds a compact message from the
+    features of an accelerometer recording. Format Result for with the following arguments:
+       {
+            'datetime': recording datetime of the accelerometer,
+            'hwid': hardware sensor id,
+            'bands': frequency bands in Hz of the band energies,
+            'channels': rms, peak, crest factor, band energies, spectral
+                centroid and dominant frequency of each channel,
+        }
+    """
+
+    async def build_message(self, features: data.VibrationFeatures) -> data.Message:
+        """Build a message from the vibration features of a recording."""
+        json_string = features.model_dump_json(
+            include={"datetime", "hwid", "duration", "bands", "channels"}
+        )
+        return data.Message(content=json_string)
@@ -1,7 +1,9 @@
 """Messengers for the acoupi package."""
 
+import asyncio
 import datetime
 import logging
+import threading
 from typing import Optional
 
 import paho.mqtt.client as mqtt
@@ -51,6 +53,7 @@ class MQTTMessenger(Messenger):
             client_id=clientid,
         )
         self.client.username_pw_set(username, password)
+        self._lock = threading.Lock()
 
     def _on_connect(self, client, userdata, flags, rc, properties=None):
         """Callback for when client connects."""
@@ -67,30 +70,16 @@ class MQTTMessenger(Messenger):
         """Callback for when message is published."""
         logger.info(f"MQTT message published successfully, mid: {mid}")
 
-    async def send_message(self, message: data.Message) -> data.Response:
-        """Send a measurement message."""
-        status = data.ResponseStatus.SUCCESS
-
-        try:
-            self.client.connect(self.host, port=self.port, keepalive=60)
-
-            response = self.client.publish(
-                self.topic,
-                payload=message.content,
-            )
-            response.wait_for_publish(timeout=5)
-
-            if not response.rc == mqtt.MQTT_ERR_SUCCESS:
-                status = data.ResponseStatus.ERROR
-
-            # Disconnect immediately after sending
-            self.client.disconnect()
-
-        except ValueError:
-            status = data.ResponseStatus.ERROR
-        except RuntimeError:
-            status = data.ResponseStatus.FAILED
+    async def send_message(
+        self, message: data.Message, topic: Optional[str] = None
+    ) -> data.Response:
+        """Send a measurement message.
 
+        The message is sent to the messenger topic unless another topic is
+        given. The blocking connect and publish run in a worker thread, so
+        an unreachable broker does not hold up the event loop.
+        """
+        status = await asyncio.to_thread(self._publish, message, topic)
         received_on = datetime.datetime.now()
 
         return data.Response(
@@ -99,6 +88,37 @@ class MQTTMessenger(Messenger):
             received_on=received_on,
         )
 
+    def _publish(
+        self, message: data.Message, topic: Optional[str] = None
+    ) -> data.ResponseStatus:
+        """Connect, publish the message and disconnect."""
+        status = data.ResponseStatus.SUCCESS
+
+        # The client is shared by every task sending messages
+        with self._lock:
+            try:
+                self.client.connect(self.host, port=self.port, keepalive=60)
+
+                response = self.client.publish(
+                    topic or self.topic,
+                    payload=message.content,
+                )
+                response.wait_for_publish(timeout=5)
+
+                if not response.rc == mqtt.MQTT_ERR_SUCCESS:
+                    status = data.ResponseStatus.ERROR
+
+                # Disconnect immediately after sending
+                self.client.disconnect()
+
+            except ValueError:
+                status = data.ResponseStatus.ERROR
+            except (RuntimeError, OSError) as e:
+                logger.error(f"Could not publish MQTT message: {e}")
+                status = data.ResponseStatus.FAILED
+
+        return status
+
     def disconnect(self):
         """Properly disconnect the MQTT client."""
         if self.client.is_connected():
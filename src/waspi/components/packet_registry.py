@@ -0,0 +1,128 @@
+"""Packet-ID dispatch of SerialTransfer frames."""
+
+import logging
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from waspi.components.payload_schema import PayloadSchema, PayloadSchemaError
+from waspi.components.serial_transport import SerialFrame
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "PacketHandler",
+    "PacketRegistry",
+    "PacketType",
+]
+
+PacketHandler = Callable[[SerialFrame, tuple], Awaitable[None]]
+"""Async handler called with a frame and its decoded values."""
+
+
+class PacketType(NamedTuple):
+    """The schema and handlers registered for a packet ID."""
+
+    name: str
+    """Name of the packet type, for logging."""
+
+    schema: Optional[PayloadSchema]
+    """Schema to decode the payload with. None passes the raw payload."""
+
+    handlers: List[PacketHandler]
+    """Handlers called with every decoded packet."""
+
+
+class PacketRegistry:
+    """Route frames to async handlers by packet ID.
+
+    Each packet ID is registered with a payload schema. A frame is decoded
+    once with the schema of its packet ID, and the decoded values are
+    passed to every handler registered for that ID. This lets a single
+    serial stream carry several kinds of packets, e.g. periodic reports,
+    sample blocks, status packets and command acks.
+
+    Example:
+        >>> registry = PacketRegistry()
+        >>> registry.register(0, PayloadSchema(hwid_list), on_report)
+        >>> await registry.dispatch(frame)
+    """
+
+    def __init__(self) -> None:
+        """Initialise an empty registry."""
+        self.packet_types: Dict[int, PacketType] = {}
+
+    def register(
+        self,
+        packet_id: int,
+        schema: Optional[PayloadSchema],
+        handler: PacketHandler,
+        name: str = "",
+    ) -> None:
+        """Register a handler for a packet ID.
+
+        Several handlers can be registered for the same packet ID, but they
+        must all use the same schema.
+
+        Raises:
+            ValueError: If the packet ID is already registered with a
+                different schema.
+        """
+        packet_type = self.packet_types.get(packet_id)
+
+        if packet_type is None:
+            packet_type = PacketType(
+                name=name or f"packet {packet_id}",
+                schema=schema,
+                handlers=[],
+            )
+            self.packet_types[packet_id] = packet_type
+
+        elif packet_type.schema is not schema:
+            raise ValueError(
+                f"Packet ID {packet_id} is already registered with another schema."
+            )
+
+        packet_type.handlers.append(handler)
+
+    def unregister(self, packet_id: int, handler: PacketHandler) -> None:
+        """Remove a handler for a packet ID."""
+        packet_type = self.packet_types.get(packet_id)
+
+        if packet_type is not None and handler in packet_type.handlers:
+            packet_type.handlers.remove(handler)
+
+    def decode(self, frame: SerialFrame):
+        """Decode the payload of a frame with the schema of its packet ID.
+
+        Raises:
+            KeyError: If the packet ID is not registered.
+            PayloadSchemaError: If the payload does not match the schema.
+        """
+        schema = self.packet_types[frame.packet_id].schema
+
+        if schema is None:
+            return frame.payload
+
+        return schema.decode(frame.payload)
+
+    async def dispatch(self, frame: SerialFrame) -> bool:
+        """Decode a frame and pass it to the handlers of its packet ID.
+
+        Returns:
+            Whether the frame was decoded and handled.
+        """
+        packet_type = self.packet_types.get(frame.packet_id)
+
+        if packet_type is None:
+            logger.debug(f"No handler registered for packet ID {frame.packet_id}")
+            return False
+
+        try:
+            values = self.decode(frame)
+        except PayloadSchemaError as e:
+            logger.warning(f"Skipping {packet_type.name}: {e}")
+            return False
+
+        for handler in packet_type.handlers:
+            await handler(frame, values)
+
+        return True
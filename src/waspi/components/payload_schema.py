@@ -0,0 +1,116 @@
+"""Compiled payload schemas for SerialTransfer packets."""
+
+import struct
+from array import array
+from typing import Dict, List, Sequence, Tuple, Union
+
+__all__ = [
+    "FIELD_FORMATS",
+    "FieldSpec",
+    "PayloadSchema",
+    "PayloadSchemaError",
+]
+
+FIELD_FORMATS = {
+    "float": "f",
+    "int8": "b",
+    "uint8": "B",
+    "int16": "h",
+    "uint16": "H",
+    "int32": "i",
+    "uint32": "I",
+}
+"""Struct format characters for the field types sent by the Arduino."""
+
+FieldSpec = Union[str, Tuple[str, str]]
+
+FLOAT_ARRAY_TYPES = {"float", "int8", "uint8", "int16", "uint16"}
+"""Field types held exactly by a float array."""
+
+
+class PayloadSchemaError(ValueError):
+    """The payload does not match the schema."""
+
+
+class PayloadSchema:
+    """Decode a packet payload into named values in a single struct call.
+
+    The schema is built once from an ordered list of fields. A field is either
+    a hwid, decoded as a float, or a ``(hwid, type)`` tuple where type is one
+    of the keys of ``FIELD_FORMATS``.
+
+    Example:
+        >>> schema = PayloadSchema(["weight_scale", ("co2ppm_scd41", "uint16")])
+        >>> schema.format
+        '<fH'
+    """
+
+    hwids: List[str]
+    """The hwid of each field, in payload order."""
+
+    types: List[str]
+    """The type of each field, in payload order."""
+
+    typecode: str
+    """The array type code used to hold decoded values."""
+
+    def __init__(self, fields: Sequence[FieldSpec], byte_order: str = "<"):
+        """Compile the schema for the given fields."""
+        self.hwids = []
+        self.types = []
+
+        for field in fields:
+            if isinstance(field, str):
+                hwid, field_type = field, "float"
+            else:
+                hwid, field_type = field
+
+            if field_type not in FIELD_FORMATS:
+                raise PayloadSchemaError(
+                    f"Unknown field type {field_type!r} for {hwid!r}."
+                )
+
+            self.hwids.append(hwid)
+            self.types.append(field_type)
+
+        self.struct = struct.Struct(
+            byte_order + "".join(FIELD_FORMATS[t] for t in self.types)
+        )
+
+        # Array type code holding every field exactly
+        if set(self.types) <= FLOAT_ARRAY_TYPES:
+            self.typecode = "f"
+        else:
+            self.typecode = "d"
+
+    @property
+    def format(self) -> str:
+        """The struct format string of the schema."""
+        return self.struct.format
+
+    @property
+    def size(self) -> int:
+        """The payload size in bytes expected by the schema."""
+        return self.struct.size
+
+    def decode(self, payload) -> Tuple:
+        """Decode a payload into a tuple of values in field order.
+
+        Raises:
+            PayloadSchemaError: If the payload length does not match the
+                schema, e.g. after a firmware change.
+        """
+        if len(payload) != self.struct.size:
+            raise PayloadSchemaError(
+                f"Payload of {len(payload)} bytes does not match schema "
+                f"{self.struct.format!r} of {self.struct.size} bytes."
+            )
+        return self.struct.unpack_from(payload)
+
+    def decode_array(self, payload) -> array:
+        """Decode a payload into an array of values in field order."""
+        return array(self.typecode, self.decode(payload))
+
+    def decode_dict(self, payload) -> Dict[str, Union[int, float]]:
+        """Decode a payload into a dict of hwid to value."""
+        return dict(zip(self.hwids, self.decode(payload)))
@@ -1,15 +1,36 @@
 import asyncio
+import json
 import logging
 from pathlib import Path
 import time
+from typing import Dict, List, Optional, Sequence, Tuple
 
-from waspi.components.accel_rec import AccelRecorder
+from waspi import data
+
+from waspi.components.accel_rec import (
+    AccelRecorder,
+    ContinuousAccelRecorder,
+    TriggeredAccelRecorder,
+)
+from waspi.components.aggregation import SensorAggregator
+from waspi.components.compression import FlacCompressor
 from waspi.components.lockfile_coordinator import LockFileCoordinator
-from waspi.components.message_factories import SensorValue_MessageBuilder
+from waspi.components.message_factories import (
+    DeadbandSpec,
+    SensorAggregate_MessageBuilder,
+    SensorValue_MessageBuilder,
+    VibrationFeatures_MessageBuilder,
+)
 from waspi.components.messengers import MQTTMessenger
 from waspi.components.sensor_manager import SerialReceiver
 from waspi.components.message_stores.sqlite import SqliteMessageStore
 from waspi.components.stores.sqlite import SqliteStore
+from waspi.components.trigger import StaLtaDetector
+from waspi.components.vibration import (
+    DEFAULT_BANDS,
+    StreamingVibrationAnalyser,
+    VibrationAnalyser,
+)
 
 
 # Setup the main logger
@@ -54,10 +75,49 @@ class ProgramOrchestrater:
         max_serial_timeout: int = 60,  # Maximum time to receive serial data and send to MQTT
         break_time: int = 2,  # Sleep time before accel record
         max_cycle_time: int = 30,  # Maximum overhead time for each cycle
+        # Serial Request Configuration
+        serial_request_mode: bool = False,  # Ask the Arduino to measure instead of waiting for its report
+        # Serial Link Health Configuration
+        serial_stats_interval: int = 600,  # Time between serial link health reports
+        serial_stats_topic: Optional[str] = None,  # MQTT topic of the reports, only logged if None
+        # Sensor Aggregation Configuration
+        aggregate_windows: Optional[Sequence[float]] = None,  # Publish statistics over these windows (s) instead of every report
+        # Report-by-Exception Configuration
+        report_deadbands: Optional[Dict[str, DeadbandSpec]] = None,  # Only send a sensor when it changed by more than its deadband
+        report_max_silence: Optional[float] = None,  # Send a sensor at least every max_silence seconds
+        report_state_path: Optional[Path] = None,  # File keeping the last sent values across restarts
+        # Concurrent Mode Configuration
+        concurrent_phases: bool = False,  # Run serial, MQTT, storage and accel as independent tasks
+        serial_publish_interval: float = 0,  # Minimum time between two published reports in concurrent mode
+        serial_request_interval: float = 1,  # Time between two measurement requests in concurrent request mode
+        task_restart_delay: float = 5,  # Sleep time before restarting a failed task
+        shutdown_timeout: float = 10,  # Maximum time to drain the queues on shutdown
+        # Continuous Accelerometer Configuration
+        accel_continuous: bool = False,  # Record without gaps into accel_duration segments
+        # Accelerometer Compression Configuration
+        accel_compress: bool = False,  # Compress finished recordings to FLAC and delete the WAV
+        accel_compress_workers: int = 2,  # Maximum number of recordings compressed at once
+        # Vibration Features Configuration
+        accel_features: bool = False,  # Compute, store and publish vibration features of each recording
+        accel_feature_bands: Sequence[Tuple[float, float]] = DEFAULT_BANDS,  # Frequency bands (Hz) of the band energies
+        accel_features_topic: Optional[str] = None,  # MQTT topic of the features, the mqtt_topic if None
+        # Triggered Accelerometer Configuration
+        accel_triggered: bool = False,  # Capture continuously but only save recordings around vibration events
+        accel_pre_roll: float = 5,  # Seconds kept before the trigger of an event
+        accel_post_roll: float = 5,  # Seconds kept after the end of an event
+        accel_trigger_band: Optional[Tuple[float, float]] = None,  # Frequency band (Hz) of the trigger energy, all but DC if None
+        accel_trigger_on_ratio: float = 4,  # STA / LTA ratio that starts an event
+        accel_trigger_off_ratio: float = 2,  # STA / LTA ratio that ends an event
     ):
         """Initialize the orchestrator with configuration parameters."""
+        if serial_request_interval <= 0:
+            raise ValueError("serial_request_interval must be greater than 0")
+
         self.serial_receiver = SerialReceiver(
-            port=serial_port, baud=serial_baud, hwid_list=hwid_list
+            port=serial_port,
+            baud=serial_baud,
+            hwid_list=hwid_list,
+            request_mode=serial_request_mode,
         )
         self.mqtt_messenger = MQTTMessenger(
             host=mqtt_host,
@@ -67,18 +127,80 @@ class ProgramOrchestrater:
             clientid=mqtt_clientid,
             topic=mqtt_topic,
         )
-        self.message_factory = SensorValue_MessageBuilder()
-        self.accel_recorder = AccelRecorder(
-            duration=accel_duration,
-            samplerate=accel_samplerate,
-            audio_channels=accel_channels,
-            audio_dir=accel_dir,
+        self.message_factory = SensorValue_MessageBuilder(
+            deadbands=report_deadbands,
+            max_silence=report_max_silence,
+            state_path=report_state_path,
+        )
+        self.aggregate_factory = SensorAggregate_MessageBuilder()
+        self.aggregator = (
+            SensorAggregator(self.serial_receiver.hwid_list, aggregate_windows)
+            if aggregate_windows
+            else None
+        )
+        # Triggered recording uses the continuous capture
+        self.accel_continuous = accel_continuous or accel_triggered
+        if accel_triggered:
+            self.accel_recorder = TriggeredAccelRecorder(
+                duration=accel_duration,
+                samplerate=accel_samplerate,
+                audio_channels=accel_channels,
+                audio_dir=accel_dir,
+                pre_roll=accel_pre_roll,
+                post_roll=accel_post_roll,
+                detector=StaLtaDetector(
+                    samplerate=accel_samplerate,
+                    audio_channels=accel_channels,
+                    band=accel_trigger_band,
+                    on_ratio=accel_trigger_on_ratio,
+                    off_ratio=accel_trigger_off_ratio,
+                ),
+            )
+        else:
+            accel_recorder_class = (
+                ContinuousAccelRecorder if accel_continuous else AccelRecorder
+            )
+            self.accel_recorder = accel_recorder_class(
+                duration=accel_duration,
+                samplerate=accel_samplerate,
+                audio_channels=accel_channels,
+                audio_dir=accel_dir,
+            )
+        self.compressor = (
+            FlacCompressor(max_workers=accel_compress_workers)
+            if accel_compress
+            else None
         )
+        self.vibration_analyser = (
+            VibrationAnalyser(bands=accel_feature_bands) if accel_features else None
+        )
+        self.stream_analyser = None
+        if accel_features and self.accel_continuous:
+            # Analyse the continuous capture as it streams, not the WAV files
+            self.stream_analyser = StreamingVibrationAnalyser(
+                samplerate=accel_samplerate,
+                audio_channels=accel_channels,
+                analyser=self.vibration_analyser,
+            )
+            self.accel_recorder.on_samples = self.stream_analyser.feed
+        self.features_factory = VibrationFeatures_MessageBuilder()
+        self._feature_tasks = set()
+        self.accel_features_topic = accel_features_topic
         self.db_store = SqliteStore(db_path=db_path)
         self.db_store_message = SqliteMessageStore(db_path=db_path_message)
         self.max_serial_timeout = max_serial_timeout
         self.break_time = break_time
         self.max_cycle_time = max_cycle_time
+        self.serial_stats_interval = serial_stats_interval
+        self.serial_stats_topic = serial_stats_topic
+        self.last_serial_stats = time.time()
+        self.concurrent_phases = concurrent_phases
+        self.serial_publish_interval = serial_publish_interval
+        self.serial_request_interval = serial_request_interval
+        self.task_restart_delay = task_restart_delay
+        self.shutdown_timeout = shutdown_timeout
+        self.publish_queue: Optional[asyncio.Queue] = None
+        self.store_queue: Optional[asyncio.Queue] = None
 
         # Ensure the audio directory exists
         accel_dir.mkdir(parents=True, exist_ok=True)
@@ -110,6 +232,12 @@ class ProgramOrchestrater:
             # Build and send MQTT Message
             logger.info("Building MQTT message...")
             message = await self.message_factory.build_message(serial_output)
+
+            if message is None:
+                self.db_store.store_sensor_value(serial_output)
+                logger.info("No sensor changed beyond its deadband. Nothing to send.")
+                return True, time.time() - phase_start
+
             logger.info(f"Sending MQTT message: {message}")
             response = await self.mqtt_messenger.send_message(message)
 
@@ -121,6 +249,7 @@ class ProgramOrchestrater:
             phase_duration = time.time() - phase_start
 
             if response.status.value == 0:
+                self.message_factory.mark_sent(serial_output)
                 logger.info(
                     f"MQTT message sent successfully in {phase_duration:.2f} seconds."
                 )
@@ -134,19 +263,74 @@ class ProgramOrchestrater:
             logger.error(f"Error in process_serial_and_mqtt_phase: {e}")
             return False, phase_duration
 
+    async def process_serial_stats_phase(self):
+        """Log and publish the serial link health counters on an interval."""
+        if time.time() - self.last_serial_stats < self.serial_stats_interval:
+            return
+
+        self.last_serial_stats = time.time()
+        stats = self.serial_receiver.get_LinkStats()
+        logger.info(f"Serial link stats: {stats}")
+
+        if self.serial_stats_topic is None:
+            return
+
+        try:
+            message = data.Message(content=json.dumps(stats))
+            response = await self.mqtt_messenger.send_message(
+                message, topic=self.serial_stats_topic
+            )
+            if response.status.value != 0:
+                logger.error(
+                    f"Failed to send serial link stats: {response.status.value}"
+                )
+        except Exception as e:
+            logger.error(f"Error in process_serial_stats_phase: {e}")
+
+    async def process_aggregation_phase(self):
+        """Aggregate every periodic report and publish the closed windows.
+
+        Runs alongside the main loop when aggregate windows are configured.
+        Each report only updates the running statistics, a message is built,
+        sent and stored once per closed window.
+        """
+        logger.info(" --- START SENSOR AGGREGATION --- ")
+
+        async for sensor_frame in self.serial_receiver.frames(maxsize=1024):
+            for aggregate in self.aggregator.add(sensor_frame):
+                await self.publish_aggregate(aggregate)
+
+    async def publish_aggregate(self, aggregate: data.AggregateOutput):
+        """Send the statistics of a closed window to MQTT and store them."""
+        try:
+            message = await self.aggregate_factory.build_message(aggregate)
+            response = await self.mqtt_messenger.send_message(message)
+
+            self.db_store.store_sensor_aggregate(aggregate)
+            self.db_store_message.store_message(message)
+            self.db_store_message.store_response(response)
+
+            if response.status.value == 0:
+                logger.info(f"MQTT message sent for the {aggregate.window}s window.")
+            else:
+                logger.error(f"Failed to send MQTT message: {response.status.value}")
+
+        except Exception as e:
+            logger.error(f"Error in publish_aggregate: {e}")
+
     async def break_time_phase(self):
         """Step 2: Sleep for a break time before recording accelerometer data."""
         logger.info(" --- START BREAK TIME PHASE --- ")
         await asyncio.sleep(self.break_time)
 
     async def process_accel_phase(self):
-        """Step e: Record accelerometer data."""
+        """Step 3: Record accelerometer data."""
         logger.info(" --- START ACCEL RECORDING PHASE --- ")
         phase_start = time.time()
 
         try:
             # Record accelerometer data
-            recording = self.accel_recorder.record()
+            recording = await self.accel_recorder.record()
 
             phase_duration = time.time() - phase_start
 
@@ -154,6 +338,8 @@ class ProgramOrchestrater:
                 logger.error("Failed to record accelerometer data.")
                 return False, phase_duration
 
+            await self.on_accel_recording(recording)
+
             logger.info(f"Accelerometer data recorded successfully: {recording.path}")
             return True, phase_duration
 
@@ -162,20 +348,343 @@ class ProgramOrchestrater:
             logger.error(f"Error in process_accel_phase: {e}")
             return False, phase_duration
 
+    async def supervise(self, name: str, task_factory):
+        """Run a task forever, restarting it when it fails or returns.
+
+        A failure is logged and the task is restarted after a delay that
+        doubles on each consecutive failure, so one failing task does not
+        stall the others.
+        """
+        delay = self.task_restart_delay
+
+        while True:
+            started = time.time()
+
+            try:
+                await task_factory()
+                logger.warning(f"Task {name} stopped. Restarting in {delay}s.")
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                logger.error(f"Task {name} failed: {e}. Restarting in {delay}s.")
+
+            # A task that ran for a while before stopping is not backed off
+            if time.time() - started > delay:
+                delay = self.task_restart_delay
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60 * self.task_restart_delay)
+
+    async def serial_ingest_task(self):
+        """Read the periodic reports and queue them for publishing."""
+        if self.serial_receiver.request_mode:
+            while True:
+                serial_output = await self.serial_receiver.get_SerialRx()
+                if serial_output is not None:
+                    await self.publish_queue.put(serial_output)
+                await asyncio.sleep(self.serial_request_interval)
+
+        last_published = 0.0
+
+        async for sensor_frame in self.serial_receiver.frames(maxsize=1024):
+            if self.aggregator is not None:
+                for aggregate in self.aggregator.add(sensor_frame):
+                    await self.publish_queue.put(aggregate)
+
+            elif sensor_frame.received_on - last_published >= self.serial_publish_interval:
+                last_published = sensor_frame.received_on
+                await self.publish_queue.put(sensor_frame.to_serial_output())
+
+    async def mqtt_publish_task(self):
+        """Build and send a message for every queued report.
+
+        Every report is passed on to storage, even if it could not be sent,
+        so a broker failure never loses readings.
+        """
+        while True:
+            output = await self.publish_queue.get()
+            message = None
+            response = None
+
+            try:
+                if isinstance(output, data.AggregateOutput):
+                    message = await self.aggregate_factory.build_message(output)
+                else:
+                    message = await self.message_factory.build_message(output)
+
+                if message is not None:
+                    response = await self.mqtt_messenger.send_message(message)
+                    if response.status.value != 0:
+                        logger.error(
+                            f"Failed to send MQTT message: {response.status.value}"
+                        )
+                    elif isinstance(output, data.SerialOutput):
+                        self.message_factory.mark_sent(output)
+
+            except Exception as e:
+                logger.error(f"Error publishing serial output: {e}")
+
+            try:
+                await self.store_queue.put((output, message, response))
+            finally:
+                self.publish_queue.task_done()
+
+    async def storage_task(self):
+        """Write the queued reports and messages to the databases.
+
+        The sqlite writes run in a worker thread so they do not block the
+        serial link or the MQTT client.
+        """
+        while True:
+            item = await self.store_queue.get()
+
+            try:
+                await asyncio.to_thread(self.store_output, *item)
+
+            except Exception as e:
+                logger.error(f"Error storing serial output: {e}")
+
+            finally:
+                self.store_queue.task_done()
+
+    def store_output(self, output, message, response):
+        """Store a report and the message sent for it."""
+        if isinstance(output, data.AggregateOutput):
+            self.db_store.store_sensor_aggregate(output)
+        else:
+            self.db_store.store_sensor_value(output)
+
+        if message is not None:
+            self.db_store_message.store_message(message)
+        if response is not None:
+            self.db_store_message.store_response(response)
+
+    async def accel_task(self):
+        """Record the accelerometer on its own cadence."""
+        if self.accel_continuous:
+            return await self.accel_recorder.capture(self.on_accel_recording)
+
+        while True:
+            await self.break_time_phase()
+            recording = await self.accel_recorder.record()
+
+            if recording is None:
+                logger.error("Failed to record accelerometer data.")
+            else:
+                await self.on_accel_recording(recording)
+
+    async def on_accel_recording(self, recording: data.AccelRecording):
+        """Store a finished accelerometer recording and queue its compression."""
+        logger.info(f"Accelerometer recording finished: {recording.path}")
+        try:
+            await asyncio.to_thread(self.db_store.store_accel_recording, recording)
+        except Exception as e:
+            logger.error(f"Error storing accelerometer recording: {e}")
+
+        if self.stream_analyser is not None:
+            # Published in the background so the capture is not held up
+            future = self.stream_analyser.end_segment(recording)
+            task = asyncio.create_task(
+                self.process_vibration_features(recording, future)
+            )
+            self._feature_tasks.add(task)
+            task.add_done_callback(self._feature_tasks.discard)
+
+        elif self.vibration_analyser is not None:
+            # Features are computed from the WAV, before it is compressed
+            await self.process_vibration_features(recording)
+
+        if self.compressor is not None:
+            self.compressor.submit(recording, self.on_accel_compressed)
+
+    async def process_vibration_features(
+        self, recording: data.AccelRecording, features_future=None
+    ):
+        """Compute the vibration features of a recording, store and publish them.
+
+        If given, the features are taken from the future of the streaming
+        analyser instead of being computed from the WAV file.
+        """
+        try:
+            if features_future is not None:
+                features = await asyncio.wrap_future(features_future)
+            else:
+                features = await asyncio.to_thread(
+                    self.vibration_analyser.analyse, recording
+                )
+            await asyncio.to_thread(self.db_store.store_vibration_features, features)
+
+            message = await self.features_factory.build_message(features)
+            response = await self.mqtt_messenger.send_message(
+                message, topic=self.accel_features_topic
+            )
+            await asyncio.to_thread(self.db_store_message.store_message, message)
+            await asyncio.to_thread(self.db_store_message.store_response, response)
+
+            if response.status.value != 0:
+                logger.error(
+                    f"Failed to send vibration features: {response.status.value}"
+                )
+
+        except Exception as e:
+            logger.error(f"Error in process_vibration_features: {e}")
+
+    async def on_accel_compressed(self, compression: data.AccelCompression):
+        """Store the path and compression ratio of a compressed recording.
+
+        If the WAV file was deleted, the recording is updated to point to
+        the compressed file.
+        """
+        try:
+            await asyncio.to_thread(self.db_store.store_accel_compression, compression)
+            if self.compressor.delete_source:
+                await asyncio.to_thread(
+                    self.db_store.update_accel_recording_file,
+                    compression.recording_id,
+                    compression.path,
+                    compression.compressed_size,
+                )
+        except Exception as e:
+            logger.error(f"Error storing accelerometer compression: {e}")
+
+    async def stop_accel_processing(self):
+        """Let the pending features and compressions finish on shutdown."""
+        if self._feature_tasks:
+            await asyncio.wait(self._feature_tasks, timeout=self.shutdown_timeout)
+
+        if self.stream_analyser is not None:
+            await asyncio.to_thread(self.stream_analyser.close)
+
+        if self.compressor is None:
+            return
+
+        try:
+            await asyncio.wait_for(
+                self.compressor.join(), timeout=self.shutdown_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Cancelled {self.compressor.pending} compressions on shutdown, "
+                f"their WAV files are kept."
+            )
+            await self.compressor.cancel()
+
+    async def serial_stats_task(self):
+        """Report the serial link health on its own cadence."""
+        while True:
+            await asyncio.sleep(self.serial_stats_interval)
+            await self.process_serial_stats_phase()
+
+    async def run_program_concurrently(self):
+        """Run serial ingestion, MQTT, storage and accel as concurrent tasks.
+
+        Unlike run_program_continuously, reports keep being read while the
+        accelerometer records. Each task is supervised and restarted on
+        failure. When cancelled, the producers are stopped first and the
+        queued reports are published and stored before returning.
+        """
+        logger.info("Starting the concurrent program tasks...")
+        self.publish_queue = asyncio.Queue(maxsize=256)
+        self.store_queue = asyncio.Queue(maxsize=256)
+
+        producers = {
+            "serial": self.serial_ingest_task,
+            "accel": self.accel_task,
+            "serial_stats": self.serial_stats_task,
+        }
+        consumers = {
+            "mqtt": self.mqtt_publish_task,
+            "storage": self.storage_task,
+        }
+        producer_tasks = [
+            asyncio.create_task(self.supervise(name, factory), name=name)
+            for name, factory in producers.items()
+        ]
+        consumer_tasks = [
+            asyncio.create_task(self.supervise(name, factory), name=name)
+            for name, factory in consumers.items()
+        ]
+
+        try:
+            # Unlike gather, wait does not cancel the tasks when cancelled,
+            # so the consumers are still running to drain the queues.
+            await asyncio.wait(producer_tasks + consumer_tasks)
+
+        finally:
+            await self.shutdown(producer_tasks, consumer_tasks)
+
+    async def shutdown(self, producer_tasks, consumer_tasks):
+        """Stop the producers, drain the queues, then stop the consumers."""
+        logger.info("Shutting down the program tasks...")
+
+        for task in producer_tasks:
+            task.cancel()
+        await asyncio.gather(*producer_tasks, return_exceptions=True)
+        await self.serial_receiver.close()
+
+        aggregates = self.aggregator.flush() if self.aggregator is not None else []
+
+        try:
+            await asyncio.wait_for(
+                self.drain_queues(aggregates), timeout=self.shutdown_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Dropped {len(aggregates)} unqueued aggregates, "
+                f"{self.publish_queue.qsize()} unpublished and "
+                f"{self.store_queue.qsize()} unstored reports on shutdown."
+            )
+
+        for task in consumer_tasks:
+            task.cancel()
+        await asyncio.gather(*consumer_tasks, return_exceptions=True)
+        await self.stop_accel_processing()
+        self.mqtt_messenger.disconnect()
+
+    async def drain_queues(self, aggregates: Optional[List[data.AggregateOutput]] = None):
+        """Wait until every queued report is published and stored.
+
+        The given aggregates are queued first, waiting for room in the
+        publish queue, and removed from the list once queued.
+        """
+        while aggregates:
+            await self.publish_queue.put(aggregates[0])
+            del aggregates[0]
+
+        await self.publish_queue.join()
+        await self.store_queue.join()
+
     async def run_program_continuously(self):
         """Run the program continuously in a loop."""
+        if self.concurrent_phases:
+            return await self.run_program_concurrently()
 
         logger.info("Starting the main program loop...")
+        background_tasks = []
+        if self.aggregator is not None:
+            background_tasks.append(
+                asyncio.create_task(self.process_aggregation_phase())
+            )
+        if self.accel_continuous:
+            background_tasks.append(
+                asyncio.create_task(self.supervise("accel", self.accel_task))
+            )
+
         try:
             while True:
                 # Step 1: Process Serial and MQTT
-                await self.process_serial_and_mqtt_phase()
+                if self.aggregator is None:
+                    await self.process_serial_and_mqtt_phase()
+                await self.process_serial_stats_phase()
 
                 # Step 2: Break time before accelerometer recording
                 await self.break_time_phase()
 
                 # Step 3: Process Accelerometer
-                await self.process_accel_phase()
+                if not self.accel_continuous:
+                    await self.process_accel_phase()
 
                 await asyncio.sleep(2)  # Very short sleep
 
@@ -186,6 +695,12 @@ class ProgramOrchestrater:
             logger.error(f"An error occurred in the main loop: {e}")
             raise
 
+        finally:
+            for task in background_tasks:
+                task.cancel()
+            await asyncio.gather(*background_tasks, return_exceptions=True)
+            await self.stop_accel_processing()
+
 
 class SyncAwareOrchestrator:
     """Extended Orchestrator that coordinate with sync operations."""
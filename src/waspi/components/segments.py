@@ -0,0 +1,305 @@
+"""Time-indexed access to recorded accelerometer segments."""
+
+import bisect
+import collections
+import datetime
+import logging
+import math
+import struct
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from waspi import data
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "Segment",
+    "SegmentReader",
+    "read_wav_header",
+]
+
+FILENAME_FORMAT = "%Y%m%d_%H%M%S_%f"
+"""The datetime format of the recording file names."""
+
+LEGACY_FILENAME_FORMAT = "%Y%m%d_%H%M%S"
+"""The format of the file names of older recordings, to the second."""
+
+
+class Segment(NamedTuple):
+    """A recorded WAV segment in the time index."""
+
+    start: datetime.datetime
+    """The datetime of the first frame."""
+
+    path: Path
+    """The path to the WAV file."""
+
+    samplerate: int
+    """The samplerate in Hz."""
+
+    channels: int
+    """The number of channels."""
+
+    frames: int
+    """The number of frames in the file."""
+
+    data_offset: int
+    """The offset in bytes of the first frame in the file."""
+
+    @property
+    def end(self) -> datetime.datetime:
+        """The datetime just after the last frame."""
+        return self.start + datetime.timedelta(seconds=self.frames / self.samplerate)
+
+
+def read_wav_header(path: Path) -> Tuple[int, int, int, int]:
+    """Read the format and data position of a 16-bit PCM WAV file.
+
+    The frame count is limited to the data actually in the file, so a
+    file whose header was not updated, e.g. when arecord was killed, can
+    still be read.
+
+    Returns:
+        The samplerate, number of channels, number of frames and offset in
+        bytes of the first frame.
+
+    Raises:
+        ValueError: If the file is not a 16-bit PCM WAV file.
+    """
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12:
+            raise ValueError(f"{path} is not a WAV file")
+
+        riff, _, wave_id = struct.unpack("<4sI4s", header)
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError(f"{path} is not a WAV file")
+
+        file_size = path.stat().st_size
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{path} has no data chunk")
+
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                fmt_chunk = f.read(16)
+                if chunk_size < 16 or len(fmt_chunk) < 16:
+                    raise ValueError(f"{path} has an invalid fmt chunk")
+                fmt = struct.unpack("<HHIIHH", fmt_chunk)
+                f.seek(chunk_size - 16 + chunk_size % 2, 1)
+
+            elif chunk_id == b"data":
+                break
+
+            else:
+                f.seek(chunk_size + chunk_size % 2, 1)
+
+        data_offset = f.tell()
+
+    if fmt is None:
+        raise ValueError(f"{path} has no fmt chunk")
+
+    format_tag, channels, samplerate, _, _, bits = fmt
+    if format_tag not in (1, 0xFFFE) or bits != 16:
+        raise ValueError(f"{path} is not a 16-bit PCM WAV file")
+
+    frame_size = 2 * channels
+    frames = min(chunk_size, file_size - data_offset) // frame_size
+    return samplerate, channels, frames, data_offset
+
+
+def _parse_start(stem: str) -> datetime.datetime:
+    """Get the start of a recording from its file name."""
+    try:
+        return datetime.datetime.strptime(stem, FILENAME_FORMAT)
+    except ValueError:
+        return datetime.datetime.strptime(stem, LEGACY_FILENAME_FORMAT)
+
+
+class SegmentReader:
+    """Read any time range of the recorded segments without loading them.
+
+    The reader keeps an index of the segments sorted by start time. The
+    samples of a segment are memory-mapped on first use, so only the pages
+    of the requested range are read from disk. A range within a single
+    segment is returned as a view of the mapped file, without copying.
+
+    Example:
+        >>> reader = SegmentReader.from_directory(accel_dir)
+        >>> samples = reader.read(
+        ...     datetime.datetime(2024, 5, 1, 14, 3, 10),
+        ...     datetime.datetime(2024, 5, 1, 14, 3, 40),
+        ... )
+    """
+
+    segments: List[Segment]
+    """The indexed segments, sorted by start time."""
+
+    max_open: int
+    """Maximum number of segments kept memory-mapped at once."""
+
+    def __init__(self, max_open: int = 32) -> None:
+        """Initialise an empty reader."""
+        self.segments = []
+        self.max_open = max_open
+        self._starts: List[datetime.datetime] = []
+        self._longest = datetime.timedelta(0)
+        self._maps: collections.OrderedDict = collections.OrderedDict()
+
+    @classmethod
+    def from_directory(
+        cls, directory: Path, pattern: str = "*.wav", max_open: int = 32
+    ) -> "SegmentReader":
+        """Index the WAV files of a directory by the datetime in their name.
+
+        Hidden files, e.g. segments still being written, and files that are
+        not 16-bit PCM WAV files are skipped.
+        """
+        reader = cls(max_open=max_open)
+        for path in Path(directory).glob(pattern):
+            if path.name.startswith("."):
+                continue
+
+            try:
+                start = _parse_start(path.stem)
+                reader.add(path, start)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping {path}: {e}")
+
+        return reader
+
+    @classmethod
+    def from_recordings(
+        cls, recordings: Iterable[data.AccelRecording], max_open: int = 32
+    ) -> "SegmentReader":
+        """Index recordings, using their datetime rather than their file name."""
+        reader = cls(max_open=max_open)
+        for recording in recordings:
+            if recording.path is None or Path(recording.path).suffix != ".wav":
+                continue
+
+            try:
+                reader.add(Path(recording.path), recording.datetime)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping {recording.path}: {e}")
+
+        return reader
+
+    @property
+    def start(self) -> Optional[datetime.datetime]:
+        """The start of the first segment."""
+        return self.segments[0].start if self.segments else None
+
+    @property
+    def end(self) -> Optional[datetime.datetime]:
+        """The end of the last segment."""
+        return max((s.end for s in self.segments), default=None)
+
+    def add(self, path: Path, start: datetime.datetime) -> Segment:
+        """Read the header of a WAV file and add it to the index."""
+        samplerate, channels, frames, data_offset = read_wav_header(path)
+        segment = Segment(
+            start=start,
+            path=path,
+            samplerate=samplerate,
+            channels=channels,
+            frames=frames,
+            data_offset=data_offset,
+        )
+        index = bisect.bisect_right(self._starts, start)
+        self._starts.insert(index, start)
+        self.segments.insert(index, segment)
+        self._longest = max(self._longest, segment.end - segment.start)
+        return segment
+
+    def find(
+        self, start: datetime.datetime, end: datetime.datetime
+    ) -> List[Segment]:
+        """The segments overlapping the time range, in order."""
+        # No segment starting more than the longest duration before start
+        # can reach it
+        first = bisect.bisect_left(self._starts, start - self._longest)
+        last = bisect.bisect_left(self._starts, end)
+        return [s for s in self.segments[first:last] if s.end > start]
+
+    def slices(
+        self, start: datetime.datetime, end: datetime.datetime
+    ) -> Iterator[Tuple[datetime.datetime, np.ndarray]]:
+        """Yield the start and samples of each segment part in the range.
+
+        The samples are int16 views of the mapped files, with one column
+        per channel. Gaps between the segments are skipped.
+        """
+        for segment in self.find(start, end):
+            offset = (start - segment.start).total_seconds()
+            length = (end - start).total_seconds()
+            first = max(0, math.floor(offset * segment.samplerate))
+            last = min(
+                segment.frames, math.ceil((offset + length) * segment.samplerate)
+            )
+            if last <= first:
+                continue
+
+            yield (
+                segment.start + datetime.timedelta(seconds=first / segment.samplerate),
+                self._map(segment)[first:last],
+            )
+
+    def read(self, start: datetime.datetime, end: datetime.datetime) -> np.ndarray:
+        """Get the samples between start and end.
+
+        The result is a view of the mapped file if the range lies within a
+        single segment, otherwise the parts are copied into a new array.
+
+        Raises:
+            ValueError: If there is no data, or a gap, in the range, or the
+                segments have a different format.
+        """
+        parts = list(self.slices(start, end))
+        if not parts:
+            raise ValueError(f"No recorded data between {start} and {end}")
+
+        if len(parts) == 1:
+            return parts[0][1]
+
+        samplerate = self.find(start, end)[0].samplerate
+        expected = parts[0][0]
+        for part_start, samples in parts:
+            if abs((part_start - expected).total_seconds()) * samplerate > 1:
+                raise ValueError(f"Recorded data has a gap at {expected}")
+            expected = part_start + datetime.timedelta(
+                seconds=len(samples) / samplerate
+            )
+
+        if len({samples.shape[1] for _, samples in parts}) > 1:
+            raise ValueError("Segments have a different number of channels")
+
+        return np.concatenate([samples for _, samples in parts])
+
+    def close(self) -> None:
+        """Unmap all the segments."""
+        self._maps.clear()
+
+    def _map(self, segment: Segment) -> np.ndarray:
+        """Memory-map the samples of a segment, keeping recent ones open."""
+        samples = self._maps.get(segment.path)
+        if samples is not None:
+            self._maps.move_to_end(segment.path)
+            return samples
+
+        samples = np.memmap(
+            segment.path,
+            dtype="<i2",
+            mode="r",
+            offset=segment.data_offset,
+            shape=(segment.frames, segment.channels),
+        )
+        self._maps[segment.path] = samples
+        if len(self._maps) > self.max_open:
+            self._maps.popitem(last=False)
+        return samples
@@ -1,22 +1,50 @@
 """Implementation of a SensorReporter for waspi."""
 
 import arrow
-import datetime
 import asyncio
-from typing import List
+import logging
+import struct
+import time
+from array import array
+from typing import AsyncIterator, List
+
+import serial
 
 from pySerialTransfer import pySerialTransfer as txfr
 from waspi import data
-from waspi.components.waspi_util import get_float
+from waspi.components.packet_registry import PacketRegistry
+from waspi.components.payload_schema import FieldSpec, PayloadSchema
+from waspi.components.serial_transport import (
+    OverflowPolicy,
+    SerialFrameReader,
+    get_usb_id,
+    put_frame,
+    resolve_port,
+)
+
+logger = logging.getLogger(__name__)
+
+PERIODIC_REPORT_ID = 0
+"""Packet ID of the periodic report sent by the Arduino."""
+
+MEASURE_REQUEST_ID = 1
+"""Packet ID of a host request for an immediate measurement."""
+
+MEASURE_REPLY_ID = 2
+"""Packet ID of the Arduino reply to a measurement request."""
+
+SEQUENCE = struct.Struct("<H")
+"""Sequence number matching a measurement reply to its request."""
 
 
 class SensorReporter:
     """Get the sensor report for a given sensor HWID."""
 
-    def __init__(self, hwid_list: List[str]):
-        self.hwid_list = hwid_list
+    def __init__(self, hwid_list: List[FieldSpec]):
+        self.schema = PayloadSchema(hwid_list)
+        self.hwid_list = self.schema.hwids
 
-    def get_SensorInfo(self, n):
+    def get_SensorInfo(self, n, timestamp=None):
         # async def get_SensorInfo(self, n):
         """Create an sensor dict object."""
 
@@ -24,64 +52,329 @@ class SensorReporter:
 
         for hwid in self.hwid_list:
             sensor_values[hwid] = data.SensorValue(
-                hwid=hwid, value=n[hwid], timestamp=arrow.utcnow().datetime.timestamp()
+                hwid=hwid,
+                value=n[hwid],
+                timestamp=(
+                    timestamp
+                    if timestamp is not None
+                    else arrow.utcnow().datetime.timestamp()
+                ),
             )
         return sensor_values
 
-    def get_PeriodicReport(self):
-        """Create a report based on the sensor object."""
+    def get_PeriodicReport(self, payload, received_on=None):
+        """Create a report based on the sensor object.
 
-        idx_value = {}
-        idx = 0
+        If given, received_on (unix time) is used as the timestamp of the
+        report instead of the current time.
+        """
 
         # 1/ Format Sensor Values
-        for hwid in self.hwid_list:
-            idx, idx_value[hwid] = get_float(link, idx)
-            idx_value[hwid] = round(idx_value[hwid], 3)
+        values = self.schema.decode(payload)
 
         # 2/ Format Sensor Report
-        sensor_info = self.get_SensorInfo(idx_value)
-        return data.SerialOutput(content=sensor_info, datetime=datetime.datetime.now())
+        return self.build_report(values, received_on)
+
+    def build_frame(self, values, received_on=None):
+        """Create a compact SensorFrame from values decoded with the schema."""
+        if received_on is None:
+            received_on = time.time()
+
+        return data.SensorFrame(
+            self.hwid_list, array(self.schema.typecode, values), received_on
+        )
+
+    def build_report(self, values, received_on=None):
+        """Create a report from values decoded with the schema."""
+        return self.build_frame(values, received_on).to_serial_output()
 
 
 class SerialReceiver(SensorReporter):
-    """Get the sensor values from the Serial Port. -> Parent class SensorReporter."""
+    """Get the sensor values from the Serial Port. -> Parent class SensorReporter.
+
+    The receiver keeps a single serial link open across cycles. Opening the
+    port resets most Arduino boards, so the link is only reopened when it
+    fails, with an exponential backoff between attempts. If the board comes
+    back under a new device path, it is found again by its USB identity.
+
+    In request mode, get_SerialRx asks the Arduino for a measurement instead
+    of waiting for its next periodic report.
 
-    def __init__(self, port, baud, hwid_list):
+    Incoming frames are routed by packet ID through the receiver's
+    PacketRegistry, where handlers for further packet types can be added.
+    """
+
+    def __init__(
+        self,
+        port,
+        baud,
+        hwid_list,
+        timeout: float = 28,
+        reconnect_delay: float = 1,
+        max_reconnect_delay: float = 60,
+        queue_size: int = 64,
+        request_mode: bool = False,
+        request_timeout: float = 5,
+    ):
         # Call the __init__ method of the parent class - SensorInfo
         super().__init__(hwid_list)
         self.port = port
         self.baud = baud
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.queue_size = queue_size
+        self.request_mode = request_mode
+        self.request_timeout = request_timeout
+
+        self.reply_schema = PayloadSchema([("sequence", "uint16")] + list(hwid_list))
+        self.registry = PacketRegistry()
+        self.registry.register(
+            PERIODIC_REPORT_ID,
+            self.schema,
+            self._on_periodic_report,
+            name="periodic report",
+        )
+        self.registry.register(
+            MEASURE_REPLY_ID,
+            self.reply_schema,
+            self._on_measure_reply,
+            name="measurement reply",
+        )
+
+        self.link = None
+        self.reader = None
+        self.usb_id = None
+        self.reconnects = 0
+        self.latest_report = None
+        self._new_report = asyncio.Event()
+        self._subscribers = []
+        self._connected = asyncio.Event()
+        self._pending_requests = {}
+        self._sequence = 0
+        self._task = None
+
+    def start(self):
+        """Start the background task that owns the serial link."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the background task and close the serial link."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._disconnect()
 
     async def get_SerialRx(self):
+        """Return the latest periodic report.
+
+        If a report was received since the last call it is returned
+        immediately, otherwise wait for the next one. Returns None if no
+        report is received within the timeout.
+        """
+        if self.request_mode:
+            return await self.request_measurement()
+
+        self.start()
+
         try:
-            global link
-            link = txfr.SerialTransfer(self.port, self.baud, restrict_ports=False)
-            link.debug = True
-            link.open()
+            await asyncio.wait_for(self._new_report.wait(), timeout=self.timeout)
+            self._new_report.clear()
+            return self.latest_report.to_serial_output()
+
+        except asyncio.TimeoutError:
+            logger.warning(f"No periodic report received within {self.timeout}s")
+            return None
 
-            # Set callbacks_list
-            callbacks = [self.get_PeriodicReport]
-            link.set_callbacks(callbacks)
+        except Exception as e:
+            logger.error(f"Failed to decode periodic report: {e}")
+            return None  # Return None in case of an exception
 
-            stop_event = asyncio.Event()
+    def get_LinkStats(self):
+        """Get the health counters of the serial link.
 
-            async def stop_after_timeout():
-                await asyncio.sleep(28)
-                stop_event.set()
+        Returns the counters of the current link (see
+        pySerialTransfer.LinkStats), the number of frames dropped by the
+        reader and the number of reconnections. The link counters are None
+        while the link is down.
+        """
+        return {
+            "port": self.port,
+            "connected": self.link is not None,
+            "reconnects": self.reconnects,
+            "frames_dropped": self.reader.dropped if self.reader else 0,
+            "link": self.link.stats.as_dict() if self.link else None,
+        }
+
+    async def request_measurement(self, timeout=None):
+        """Ask the Arduino to measure now and return its report.
+
+        A measurement request carrying a sequence number is sent on the
+        link, and the reply with the same sequence number is awaited.
+        Returns None if no reply is received within the timeout.
+        """
+        self.start()
+
+        if timeout is None:
+            timeout = self.request_timeout
+
+        self._sequence = (self._sequence + 1) & 0xFFFF
+        sequence = self._sequence
+        reply = asyncio.get_running_loop().create_future()
+        self._pending_requests[sequence] = reply
+
+        try:
+            values = await asyncio.wait_for(
+                self._send_request(sequence, reply), timeout=timeout
+            )
 
-            asyncio.create_task(stop_after_timeout())
+            if values is None:
+                logger.error("Failed to send measurement request")
+                return None
 
-            while not stop_event.is_set():
-                await asyncio.sleep(1)  # Give some time for callbacks to be executed
-                link.tick()
+            return self.build_report(*values)
 
-            # Collect and return the data after the loop
-            return self.get_PeriodicReport()
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"No reply to measurement request {sequence} within {timeout}s"
+            )
+            return None
 
         except Exception as e:
-            print(e)
-            return None  # Return None in case of an exception
+            logger.error(f"Failed to decode measurement reply: {e}")
+            return None
 
         finally:
+            self._pending_requests.pop(sequence, None)
+
+    async def frames(
+        self,
+        maxsize: int = 64,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+    ) -> AsyncIterator[data.SensorFrame]:
+        """Yield a SensorFrame for every periodic report as it is decoded.
+
+        Each frame is timestamped with the time its packet was received.
+        Reports that do not match the schema are skipped. Use
+        SensorFrame.to_serial_output() where a SerialOutput is needed.
+
+        Args:
+            maxsize: Maximum number of reports waiting to be consumed.
+            overflow: With DROP_OLDEST, the oldest waiting report is
+                discarded when the queue is full. With BLOCK, the receiver
+                stops reading from the link until there is room, which
+                also holds back the other consumers.
+
+        Example:
+            >>> async for sensor_frame in receiver.frames():
+            ...     print(sensor_frame.to_dict())
+        """
+        self.start()
+
+        subscriber = (asyncio.Queue(maxsize), OverflowPolicy(overflow))
+        self._subscribers.append(subscriber)
+
+        try:
+            while True:
+                yield await subscriber[0].get()
+
+        finally:
+            self._subscribers.remove(subscriber)
+
+    def _connect(self):
+        """Open the serial link and start reading from it."""
+        port = resolve_port(self.port, self.usb_id)
+        link = txfr.SerialTransfer(port, self.baud, restrict_ports=False)
+        reader = SerialFrameReader(link, maxsize=self.queue_size)
+
+        try:
+            reader.start()
+        except Exception:
             link.close()
+            raise
+
+        self.link = link
+        self.reader = reader
+        self.usb_id = get_usb_id(port) or self.usb_id
+        self._connected.set()
+        logger.info(f"Serial link open on {port}")
+
+    def _disconnect(self):
+        """Stop reading and close the serial link."""
+        self._connected.clear()
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader = None
+        if self.link is not None:
+            self.link.close()
+            self.link = None
+
+    async def _run(self):
+        """Keep the serial link open and record incoming reports."""
+        delay = self.reconnect_delay
+
+        while True:
+            try:
+                self._connect()
+                delay = self.reconnect_delay
+
+                while True:
+                    frame = await self.reader.read_frame()
+                    try:
+                        await self.registry.dispatch(frame)
+                    except Exception as e:
+                        # A failing handler must not take the link down
+                        logger.error(
+                            f"Error handling packet ID {frame.packet_id}: {e}"
+                        )
+
+            except (OSError, serial.SerialException) as e:
+                logger.error(
+                    f"Serial link on {self.port} failed: {e}. "
+                    f"Reconnecting in {delay}s."
+                )
+
+            finally:
+                self._disconnect()
+
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _on_periodic_report(self, frame, values):
+        """Record a periodic report and pass it to the subscribers."""
+        report = self.build_frame(values, frame.received_on)
+        self.latest_report = report
+        self._new_report.set()
+
+        for queue, overflow in list(self._subscribers):
+            if overflow == OverflowPolicy.BLOCK:
+                await queue.put(report)
+            elif put_frame(queue, report, overflow):
+                logger.warning("Report queue full, dropped the oldest report.")
+
+    async def _send_request(self, sequence, reply):
+        """Send a measurement request and wait for its reply."""
+        await self._connected.wait()
+
+        self.link.tx_obj(sequence, val_type_override="H")
+        if not self.link.send(SEQUENCE.size, packet_id=MEASURE_REQUEST_ID):
+            return None
+
+        return await reply
+
+    async def _on_measure_reply(self, frame, values):
+        """Resolve the request matching a measurement reply."""
+        sequence = values[0]
+        reply = self._pending_requests.get(sequence)
+
+        if reply is None or reply.done():
+            logger.warning(f"Unexpected reply to measurement request {sequence}")
+            return
+
+        reply.set_result((values[1:], frame.received_on))
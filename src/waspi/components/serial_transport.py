@@ -0,0 +1,245 @@
+"""Asyncio transport for SerialTransfer links."""
+
+import asyncio
+import logging
+import os
+import time
+from enum import Enum
+from typing import NamedTuple, Optional, Tuple
+
+import serial
+import serial.tools.list_ports
+
+from pySerialTransfer import pySerialTransfer as txfr
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "OverflowPolicy",
+    "SerialFrame",
+    "SerialFrameReader",
+    "get_usb_id",
+    "put_frame",
+    "resolve_port",
+]
+
+UsbId = Tuple[Optional[int], Optional[int], Optional[str]]
+"""USB vendor ID, product ID and serial number of a serial device."""
+
+
+def get_usb_id(port: str) -> Optional[UsbId]:
+    """Get the USB identity of the device behind a port.
+
+    Returns None if the port is not listed or is not a USB device.
+    """
+    for info in serial.tools.list_ports.comports(include_links=True):
+        if info.device == port or os.path.realpath(info.device) == os.path.realpath(port):
+            if info.vid is None:
+                return None
+            return (info.vid, info.pid, info.serial_number)
+    return None
+
+
+def resolve_port(port: str, usb_id: Optional[UsbId] = None) -> str:
+    """Find the current path of a serial device.
+
+    When a USB device is unplugged or resets, it can come back under a new
+    path (e.g. /dev/ttyACM1 instead of /dev/ttyACM0). If the given port no
+    longer exists, look for the device with the same USB identity.
+    """
+    if os.path.exists(port) or usb_id is None:
+        return port
+
+    for info in serial.tools.list_ports.comports():
+        if (info.vid, info.pid, info.serial_number) == usb_id:
+            return info.device
+
+    return port
+
+
+class OverflowPolicy(str, Enum):
+    """What to do with a new frame when a bounded frame queue is full."""
+
+    DROP_OLDEST = "drop_oldest"
+    """Discard the oldest queued frame to make room for the new one."""
+
+    BLOCK = "block"
+    """Wait until the consumer makes room in the queue."""
+
+
+def put_frame(queue: asyncio.Queue, frame, overflow: OverflowPolicy) -> bool:
+    """Put a frame on a queue without waiting.
+
+    If the queue is full and the policy is DROP_OLDEST, the oldest frame is
+    discarded. Callers using BLOCK should wait for room before calling this.
+
+    Returns:
+        Whether a frame was dropped.
+    """
+    dropped = False
+
+    if queue.full() and overflow == OverflowPolicy.DROP_OLDEST:
+        queue.get_nowait()
+        dropped = True
+
+    queue.put_nowait(frame)
+    return dropped
+
+
+class SerialFrame(NamedTuple):
+    """A packet decoded from the serial link."""
+
+    packet_id: int
+    """The packet ID set by the sender."""
+
+    payload: bytes
+    """The unstuffed payload of the packet."""
+
+    received_on: float
+    """The unix time at which the packet was decoded."""
+
+
+class SerialFrameReader:
+    """Decode SerialTransfer packets on the event loop as bytes arrive.
+
+    The reader registers the serial file descriptor with
+    ``loop.add_reader``. Whenever the port becomes readable, the waiting
+    bytes are fed through the SerialTransfer framing state machine and
+    every decoded packet is put on a queue, so no coroutine has to poll
+    the port.
+
+    Example:
+        >>> link = txfr.SerialTransfer("/dev/ttyACM0", 115200)
+        >>> reader = SerialFrameReader(link)
+        >>> reader.start()
+        >>> frame = await reader.read_frame()
+        >>> reader.stop()
+    """
+
+    link: txfr.SerialTransfer
+    """The SerialTransfer link to read from."""
+
+    overflow: OverflowPolicy
+    """What to do when the frame queue is full."""
+
+    dropped: int
+    """Number of frames dropped because the queue was full."""
+
+    def __init__(
+        self,
+        link: txfr.SerialTransfer,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        maxsize: int = 0,
+        overflow: OverflowPolicy = OverflowPolicy.BLOCK,
+    ) -> None:
+        """Initialise the reader for the given link.
+
+        Args:
+            link: The SerialTransfer link to read from.
+            loop: The event loop to read on. Defaults to the running loop.
+            maxsize: Maximum number of queued frames. 0 means unbounded.
+            overflow: With BLOCK, reading from the port is paused while the
+                queue is full, leaving the bytes in the OS buffer. With
+                DROP_OLDEST, the oldest queued frame is discarded.
+        """
+        self.link = link
+        self.loop = loop
+        self.overflow = OverflowPolicy(overflow)
+        self.dropped = 0
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._fd: Optional[int] = None
+        self._paused = False
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the reader is registered on the event loop."""
+        return self._fd is not None
+
+    def start(self) -> None:
+        """Open the link and start reading from it on the event loop."""
+        if self.is_running:
+            return
+
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+
+        if not self.link.open():
+            raise serial.SerialException(
+                f"Could not open serial port {self.link.port_name}"
+            )
+
+        self._fd = self.link.connection.fileno()
+        self._paused = False
+        self.loop.add_reader(self._fd, self._on_readable)
+
+    def stop(self) -> None:
+        """Stop reading from the link. The link itself is left open."""
+        if self._fd is None:
+            return
+
+        if not self._paused:
+            self.loop.remove_reader(self._fd)
+        self._fd = None
+        self._paused = False
+
+    async def read_frame(self) -> SerialFrame:
+        """Wait for the next decoded frame.
+
+        Raises:
+            serial.SerialException: If the link failed while reading.
+        """
+        frame = await self.queue.get()
+
+        if self._paused:
+            self._resume()
+
+        if isinstance(frame, Exception):
+            raise frame
+
+        return frame
+
+    def _pause(self) -> None:
+        """Stop watching the port until there is room in the queue."""
+        self.loop.remove_reader(self._fd)
+        self._paused = True
+
+    def _resume(self) -> None:
+        """Watch the port again and parse any bytes already buffered."""
+        self._paused = False
+        self.loop.add_reader(self._fd, self._on_readable)
+        self.loop.call_soon(self._on_readable)
+
+    def _on_readable(self) -> None:
+        """Parse everything waiting on the port."""
+        link = self.link
+
+        try:
+            while self.is_running and not self._paused:
+                if self.queue.full() and self.overflow == OverflowPolicy.BLOCK:
+                    self._pause()
+                    break
+
+                # available() returns the payload length, so check the status
+                # to also deliver frames with an empty payload, e.g. acks
+                link.available()
+                if link.status == txfr.NEW_DATA:
+                    self._on_frame(
+                        SerialFrame(
+                            packet_id=link.idByte,
+                            payload=bytes(link.rx_payload()),
+                            received_on=time.time(),
+                        )
+                    )
+
+                elif link.status in (txfr.NO_DATA, txfr.CONTINUE):
+                    break
+
+        except (OSError, serial.SerialException) as e:
+            logger.error(f"Serial link failed: {e}")
+            self.stop()
+            put_frame(self.queue, e, OverflowPolicy.DROP_OLDEST)
+
+    def _on_frame(self, frame: SerialFrame) -> None:
+        """Hand a decoded frame to the consumers."""
+        if put_frame(self.queue, frame, self.overflow):
+            self.dropped += 1
@@ -57,6 +57,25 @@ def create_base_models(database: orm.Database) -> BaseModels:
         """Hwid of the sensor."""
 
 
+    class SensorAggregate(BaseModel):  # type: ignore
+        _table_ = "sensors_aggregate"
+
+        id = orm.PrimaryKey(UUID, auto=True)
+        """Unique ID of the aggregate."""
+
+        window = orm.Required(float)
+        """Length of the window in seconds."""
+
+        start = orm.Required(datetime)
+        """Datetime when the window started."""
+
+        end = orm.Required(datetime)
+        """Datetime when the window ended."""
+
+        content = orm.Required(str)
+        """The statistics of each sensor."""
+
+
     class AccelRecording(BaseModel):  # type: ignore
         _table_ = "accel_recording"
 
@@ -69,12 +88,107 @@ def create_base_models(database: orm.Database) -> BaseModels:
         path = orm.Optional(str, unique=True)
         """Path to the recording file."""
 
+        # Declared before the datetime attribute, which shadows the type
+        end = orm.Optional(datetime)
+        """Datetime just after the last frame of the recording."""
+
+        synced_on = orm.Optional(datetime)
+        """Datetime when the recording was uploaded, null if not yet."""
+
         datetime = orm.Required(datetime, unique=True)
         """Datetime of the recording. Should be unique."""
 
+        duration = orm.Optional(float, index=True)
+        """Duration of the recording in seconds."""
+
+        samplerate = orm.Optional(int)
+        """Samplerate of the recording in Hz."""
+
+        channels = orm.Optional(int)
+        """Number of audio channels in the recording."""
+
+        size = orm.Optional(int, size=64)
+        """Size of the recording file in bytes."""
+
+        checksum = orm.Optional(str)
+        """MD5 of the samples in hex."""
+
+        # Unsynced recordings, oldest first, are read from this index
+        orm.composite_index(synced_on, datetime)
+
+    class AccelTrigger(BaseModel):  # type: ignore
+        _table_ = "accel_trigger"
+
+        recording_id = orm.PrimaryKey(UUID)
+        """ID of the event-triggered accelerometer recording."""
+
+        triggered_on = orm.Required(datetime)
+        """Datetime when the detector first triggered."""
+
+        released_on = orm.Required(datetime)
+        """Datetime when the detector last released."""
+
+        peak_ratio = orm.Required(float)
+        """Highest STA / LTA ratio during the event."""
+
+        triggers = orm.Required(int)
+        """Number of merged triggers in the recording."""
+
+        pre_roll = orm.Required(float)
+        """Seconds of audio kept before the first trigger."""
+
+        post_roll = orm.Required(float)
+        """Seconds of audio kept after the last release."""
+
+    class AccelCompression(BaseModel):  # type: ignore
+        _table_ = "accel_compression"
+
+        id = orm.PrimaryKey(UUID, auto=True)
+        """Unique ID of the compression."""
+
+        recording_id = orm.Required(UUID, index=True)
+        """ID of the compressed accelerometer recording."""
+
+        path = orm.Required(str, unique=True)
+        """Path to the compressed file."""
+
+        original_size = orm.Required(int, size=64)
+        """Size of the original file in bytes."""
+
+        compressed_size = orm.Required(int, size=64)
+        """Size of the compressed file in bytes."""
+
+        compression_ratio = orm.Required(float)
+        """Compressed size as a fraction of the original size."""
+
+        created_on = orm.Required(datetime)
+        """Datetime when the recording was compressed."""
+
+    class VibrationFeatures(BaseModel):  # type: ignore
+        _table_ = "vibration_features"
+
+        id = orm.PrimaryKey(UUID, auto=True)
+        """Unique ID of the features."""
+
+        recording_id = orm.Required(UUID, index=True)
+        """ID of the analysed accelerometer recording."""
+
+        datetime = orm.Required(datetime)
+        """Datetime of the recording."""
+
+        hwid = orm.Required(str)
+        """Id of the accelerometer."""
+
+        content = orm.Required(str)
+        """The features of each channel."""
+
     return BaseModels(
         Deployment=Deployment,  # type: ignore
         SensorValue=SensorValue, # type: ignore
         SerialOutput=SerialOutput, # type: ignore
+        SensorAggregate=SensorAggregate, # type: ignore
         AccelRecording=AccelRecording,  # type: ignore
+        AccelTrigger=AccelTrigger,  # type: ignore
+        AccelCompression=AccelCompression,  # type: ignore
+        VibrationFeatures=VibrationFeatures,  # type: ignore
     )
@@ -1,6 +1,8 @@
 """Module defining the SqliteStore class."""
+import contextlib
 import datetime
 import json
+import sqlite3
 from pathlib import Path
 from typing import List, Optional, Tuple
 from uuid import UUID
@@ -14,6 +16,23 @@ from waspi.components import types
 from . import types as db_types
 from .database import create_base_models
 
+ACCEL_RECORDING_COLUMNS = {
+    "end": "DATETIME",
+    "synced_on": "DATETIME",
+    "duration": "REAL",
+    "samplerate": "INTEGER",
+    "channels": "INTEGER",
+    "size": "BIGINT",
+    "checksum": "TEXT NOT NULL DEFAULT ''",
+}
+"""Catalog columns missing from accel_recording tables of older versions."""
+
+ACCEL_RECORDING_INDEXES = {
+    "idx_accel_recording__duration": '"duration"',
+    "idx_accel_recording__synced_on_datetime": '"synced_on", "datetime"',
+}
+"""Indexes on the catalog columns, as created by Pony for new tables."""
+
 
 class SqliteStore(types.Store):
     """Sqlite store implementation.
@@ -27,8 +46,21 @@ class SqliteStore(types.Store):
 
     - Sensor Value: Contains the sensor values. 
 
+    - Sensor Aggregate: Contains the sensor statistics of each closed window.
+
     - Accel Recording: Contains the recording information of the accelerometer. 
-      Each recording has a datetime and a path.
+      Each recording has a datetime and a path, and its end, duration,
+      format, size, checksum and sync datetime, indexed by time and by
+      sync state.
+
+    - Accel Trigger: Contains the trigger of each event-triggered
+      accelerometer recording.
+
+    - Accel Compression: Contains the path and compression ratio of the
+      FLAC copy of an accelerometer recording.
+
+    - Vibration Features: Contains the features computed from an
+      accelerometer recording.
 
     The store is thread-safe, and can be used from multiple threads simultaneously.
     """
@@ -60,6 +92,7 @@ class SqliteStore(types.Store):
             filename=str(db_path),
             create_db=True,
         )
+        self._add_catalog_columns()
         self.database.generate_mapping(create_tables=True)
 
     @orm.db_session
@@ -101,15 +134,172 @@ class SqliteStore(types.Store):
         """
         db_sensorvalue = self._get_or_create_sensor_value(sensor_value)
 
+    @orm.db_session
+    def store_sensor_aggregate(self, aggregate_output: data.AggregateOutput) -> None:
+        """Store the aggregated sensor values locally.
+
+        Args:
+            aggregate_output: The sensor statistics of a window to store.
+        """
+        db_sensor_aggregate = self._get_or_create_sensor_aggregate(aggregate_output)
+
     @orm.db_session
     def store_accel_recording(self, accel_recording: data.AccelRecording) -> None:
-        """Store the accelerometer recordings path locally.
+        """Store the accelerometer recordings path, and trigger if any, locally.
         
         Args:
             accel_recording: The accel_recording path to store.
         """
         db_accelrecording = self._get_or_create_accel_recording(accel_recording)
 
+        trigger = accel_recording.trigger
+        if trigger is not None and self.models.AccelTrigger.get(
+            recording_id=accel_recording.id
+        ) is None:
+            self.models.AccelTrigger(
+                recording_id=accel_recording.id,
+                triggered_on=trigger.triggered_on,
+                released_on=trigger.released_on,
+                peak_ratio=trigger.peak_ratio,
+                triggers=trigger.triggers,
+                pre_roll=trigger.pre_roll,
+                post_roll=trigger.post_roll,
+            )
+            orm.commit()
+
+    @orm.db_session
+    def get_accel_recordings(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        hwid: Optional[str] = None,
+    ) -> List[data.AccelRecording]:
+        """Get the accelerometer recordings overlapping a time range.
+
+        Recordings stored without an end, by older versions, are not
+        returned.
+
+        Args:
+            start: The start of the time range.
+            end: The end of the time range, excluded.
+            hwid: Only return the recordings of this accelerometer.
+
+        Returns:
+            The recordings, ordered by datetime.
+        """
+        AccelRecording = self.models.AccelRecording
+
+        # Bounding the start by the longest recording keeps the scan of the
+        # datetime index to the recordings that may overlap
+        longest = orm.max(r.duration for r in AccelRecording)
+        if longest is None:
+            return []
+        earliest = start - datetime.timedelta(seconds=longest)
+
+        query = orm.select(
+            r
+            for r in AccelRecording
+            if r.datetime >= earliest and r.datetime < end and r.end > start
+        )
+        if hwid is not None:
+            query = query.filter(lambda r: r.hwid == hwid)
+
+        return [
+            self._to_accel_recording(r)
+            for r in query.order_by(AccelRecording.datetime)
+        ]
+
+    @orm.db_session
+    def get_unsynced_accel_recordings(
+        self, limit: int = 100
+    ) -> List[data.AccelRecording]:
+        """Get the accelerometer recordings not yet uploaded, oldest first.
+
+        Args:
+            limit: The maximum number of recordings to return.
+        """
+        AccelRecording = self.models.AccelRecording
+        query = orm.select(
+            r for r in AccelRecording if r.synced_on is None
+        ).order_by(AccelRecording.datetime)
+        return [self._to_accel_recording(r) for r in query.limit(limit)]
+
+    @orm.db_session
+    def mark_accel_recording_synced(
+        self,
+        recording_id: UUID,
+        synced_on: Optional[datetime.datetime] = None,
+    ) -> None:
+        """Record that an accelerometer recording has been uploaded.
+
+        Args:
+            recording_id: The ID of the uploaded recording.
+            synced_on: The datetime of the upload. Defaults to now.
+
+        Raises:
+            ValueError: If there is no recording with this ID.
+        """
+        db_accel_recording = self._get_accel_recording_by_id(recording_id)
+        db_accel_recording.synced_on = synced_on or datetime.datetime.now()
+        orm.commit()
+
+    @orm.db_session
+    def update_accel_recording_file(
+        self, recording_id: UUID, path: Path, size: int
+    ) -> None:
+        """Point an accelerometer recording to the file that replaced it.
+
+        Args:
+            recording_id: The ID of the recording.
+            path: The path to the new file, e.g. the compressed copy.
+            size: The size of the new file in bytes.
+
+        Raises:
+            ValueError: If there is no recording with this ID.
+        """
+        db_accel_recording = self._get_accel_recording_by_id(recording_id)
+        db_accel_recording.path = str(path)
+        db_accel_recording.size = size
+        orm.commit()
+
+    @orm.db_session
+    def store_accel_compression(self, accel_compression: data.AccelCompression) -> None:
+        """Store the compressed copy of an accelerometer recording locally.
+
+        Args:
+            accel_compression: The path and compression ratio to store.
+        """
+        if self.models.AccelCompression.get(id=accel_compression.id) is None:
+            self.models.AccelCompression(
+                id=accel_compression.id,
+                recording_id=accel_compression.recording_id,
+                path=str(accel_compression.path),
+                original_size=accel_compression.original_size,
+                compressed_size=accel_compression.compressed_size,
+                compression_ratio=accel_compression.compression_ratio,
+                created_on=accel_compression.created_on,
+            )
+            orm.commit()
+
+    @orm.db_session
+    def store_vibration_features(self, features: data.VibrationFeatures) -> None:
+        """Store the vibration features of an accelerometer recording locally.
+
+        Args:
+            features: The features of the recording to store.
+        """
+        if self.models.VibrationFeatures.get(id=features.id) is None:
+            self.models.VibrationFeatures(
+                id=features.id,
+                recording_id=features.recording_id,
+                datetime=features.datetime,
+                hwid=features.hwid,
+                content=features.model_dump_json(
+                    include={"samplerate", "duration", "bands", "channels"}
+                ),
+            )
+            orm.commit()
+
 
     #   -------------- FUNCTIONS RELATED to SENSOR_VALUE --------------   #
     @orm.db_session
@@ -147,6 +337,47 @@ class SqliteStore(types.Store):
         return sensor_value
 
 
+    #   -------------- FUNCTIONS RELATED to SENSOR_AGGREGATE --------------   #
+    @orm.db_session
+    def _create_sensor_aggregate(
+        self,
+        aggregate_output: data.AggregateOutput,
+    ) -> db_types.SensorAggregate:
+        """Create a sensor aggregate."""
+        db_sensor_aggregate = self.models.SensorAggregate(
+            id=aggregate_output.id,
+            window=aggregate_output.window,
+            start=aggregate_output.start,
+            end=aggregate_output.end,
+            content=json.dumps(
+                {hwid: stats.model_dump() for hwid, stats in aggregate_output.content.items()}
+            ),
+        )
+        orm.commit()
+        return db_sensor_aggregate
+
+    @orm.db_session
+    def _get_or_create_sensor_aggregate(
+        self,
+        aggregate_output: data.AggregateOutput,
+    ) -> db_types.SensorAggregate:
+        """Get or create a sensor aggregate."""
+        try:
+            return self._get_sensor_aggregate_by_id(aggregate_output.id)
+        except ValueError:
+            return self._create_sensor_aggregate(aggregate_output)
+
+    @orm.db_session
+    def _get_sensor_aggregate_by_id(self, id: UUID) -> db_types.SensorAggregate:
+        """Get the sensor aggregate by the id."""
+        sensor_aggregate: Optional[db_types.SensorAggregate] = self.models.SensorAggregate.get(
+            id=id
+        )
+        if sensor_aggregate is None:
+            raise ValueError("No sensor aggregate found")
+        return sensor_aggregate
+
+
     #   -------------- FUNCTIONS RELATED to ACCEL_RECORDING --------------   #
     @orm.db_session
     def _create_accel_recording(
@@ -159,6 +390,13 @@ class SqliteStore(types.Store):
             hwid=accel_recording.hwid,
             path=str(accel_recording.path),
             datetime=accel_recording.datetime,
+            end=accel_recording.end,
+            duration=accel_recording.duration,
+            samplerate=accel_recording.samplerate,
+            channels=accel_recording.audio_channels,
+            size=accel_recording.size,
+            checksum=accel_recording.checksum or "",
+            synced_on=accel_recording.synced_on,
         )
         orm.commit()
         return db_accel_recording
@@ -185,6 +423,58 @@ class SqliteStore(types.Store):
             raise ValueError("No accelerometer recording found")
         return accel_recording
 
+    @staticmethod
+    def _to_accel_recording(
+        db_accel_recording: db_types.AccelRecording,
+    ) -> data.AccelRecording:
+        """Convert a database recording to its data model."""
+        return data.AccelRecording(
+            id=db_accel_recording.id,
+            datetime=db_accel_recording.datetime,
+            hwid=db_accel_recording.hwid,
+            path=db_accel_recording.path or None,
+            end=db_accel_recording.end,
+            duration=db_accel_recording.duration,
+            samplerate=db_accel_recording.samplerate,
+            audio_channels=db_accel_recording.channels,
+            size=db_accel_recording.size,
+            checksum=db_accel_recording.checksum or None,
+            synced_on=db_accel_recording.synced_on,
+        )
+
+    def _add_catalog_columns(self) -> None:
+        """Add the catalog columns to an accel_recording table of an older version.
+
+        Pony only creates missing tables, so the columns and their indexes
+        are added here before the mapping is generated.
+        """
+        if str(self.db_path) == ":memory:" or not Path(self.db_path).exists():
+            return
+
+        with contextlib.closing(sqlite3.connect(str(self.db_path))) as connection:
+            with connection:
+                columns = {
+                    row[1]
+                    for row in connection.execute(
+                        'PRAGMA table_info("accel_recording")'
+                    )
+                }
+                if not columns:
+                    return
+
+                for name, definition in ACCEL_RECORDING_COLUMNS.items():
+                    if name not in columns:
+                        connection.execute(
+                            f'ALTER TABLE "accel_recording" '
+                            f'ADD COLUMN "{name}" {definition}'
+                        )
+
+                for name, indexed in ACCEL_RECORDING_INDEXES.items():
+                    connection.execute(
+                        f'CREATE INDEX IF NOT EXISTS "{name}" '
+                        f'ON "accel_recording" ({indexed})'
+                    )
+
 
     #   -------------- FUNCTIONS RELATED to DEPLOYMENT --------------   #
     @orm.db_session
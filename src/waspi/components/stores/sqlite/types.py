@@ -10,7 +10,11 @@ __all__ = [
     "Deployment",
     "SensorValue",
     "SerialOutput",
+    "SensorAggregate",
     "AccelRecording",
+    "AccelTrigger",
+    "AccelCompression",
+    "VibrationFeatures",
 ]
 
 
@@ -56,6 +60,25 @@ class SerialOutput(core.EntityMeta):
     """The sensor hardware id to identify the sensor."""
 
 
+class SensorAggregate(core.EntityMeta):
+    """Aggregated sensor values ORM model."""
+
+    id: UUID
+    """Unique ID of the aggregate."""
+
+    window: float
+    """Length of the window in seconds."""
+
+    start: datetime
+    """Datetime when the window started."""
+
+    end: datetime
+    """Datetime when the window ended."""
+
+    content: str
+    """The statistics of each sensor."""
+
+
 class AccelRecording(core.EntityMeta):
     """Predicted tag ORM model."""
 
@@ -71,6 +94,96 @@ class AccelRecording(core.EntityMeta):
     path: Optional[str]
     """Path to the recording file."""
 
+    end: Optional[datetime]
+    """Datetime just after the last frame of the recording."""
+
+    duration: Optional[float]
+    """Duration of the recording in seconds."""
+
+    samplerate: Optional[int]
+    """Samplerate of the recording in Hz."""
+
+    channels: Optional[int]
+    """Number of audio channels in the recording."""
+
+    size: Optional[int]
+    """Size of the recording file in bytes."""
+
+    checksum: Optional[str]
+    """MD5 of the samples in hex."""
+
+    synced_on: Optional[datetime]
+    """Datetime when the recording was uploaded, None if not yet."""
+
+
+class AccelTrigger(core.EntityMeta):
+    """Accelerometer recording trigger ORM model."""
+
+    recording_id: UUID
+    """ID of the event-triggered accelerometer recording."""
+
+    triggered_on: datetime
+    """Datetime when the detector first triggered."""
+
+    released_on: datetime
+    """Datetime when the detector last released."""
+
+    peak_ratio: float
+    """Highest STA / LTA ratio during the event."""
+
+    triggers: int
+    """Number of merged triggers in the recording."""
+
+    pre_roll: float
+    """Seconds of audio kept before the first trigger."""
+
+    post_roll: float
+    """Seconds of audio kept after the last release."""
+
+
+class AccelCompression(core.EntityMeta):
+    """Compressed accelerometer recording ORM model."""
+
+    id: UUID
+    """Unique ID of the compression."""
+
+    recording_id: UUID
+    """ID of the compressed accelerometer recording."""
+
+    path: str
+    """Path to the compressed file."""
+
+    original_size: int
+    """Size of the original file in bytes."""
+
+    compressed_size: int
+    """Size of the compressed file in bytes."""
+
+    compression_ratio: float
+    """Compressed size as a fraction of the original size."""
+
+    created_on: datetime
+    """Datetime when the recording was compressed."""
+
+
+class VibrationFeatures(core.EntityMeta):
+    """Vibration features ORM model."""
+
+    id: UUID
+    """Unique ID of the features."""
+
+    recording_id: UUID
+    """ID of the analysed accelerometer recording."""
+
+    datetime: datetime
+    """Datetime of the recording."""
+
+    hwid: str
+    """Id of the accelerometer."""
+
+    content: str
+    """The features of each channel."""
+
 
 class BaseModels(NamedTuple):
     """Container for models."""
@@ -78,4 +191,8 @@ class BaseModels(NamedTuple):
     Deployment: Deployment
     SensorValue: SensorValue
     SerialOutput: SerialOutput
-    AccelRecording: AccelRecording
\ No newline at end of file
+    SensorAggregate: SensorAggregate
+    AccelRecording: AccelRecording
+    AccelTrigger: AccelTrigger
+    AccelCompression: AccelCompression
+    VibrationFeatures: VibrationFeatures
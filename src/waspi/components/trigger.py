@@ -0,0 +1,137 @@
+"""Activity detection on the accelerometer stream."""
+
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "StaLtaDetector",
+]
+
+
+class StaLtaDetector:
+    """Detect vibration events with a short-term / long-term average ratio.
+
+    Raw S16_LE blocks are passed to update. The energy of each block is
+    computed in the frequency band of interest, summed over the channels,
+    and tracked by two exponential averages: a short-term one (STA) that
+    follows the events and a long-term one (LTA) that follows the
+    background. The detector triggers when STA / LTA rises above on_ratio
+    and releases when it falls below off_ratio. The LTA is frozen while
+    triggered, so a long event does not raise its own baseline.
+
+    Example:
+        >>> detector = StaLtaDetector(44100, 2, band=(20, 2000))
+        >>> triggered = detector.update(block)
+    """
+
+    samplerate: int
+    """The samplerate of the stream in Hz."""
+
+    audio_channels: int
+    """The number of channels in the stream."""
+
+    band: Optional[Tuple[float, float]]
+    """The frequency band in Hz of the energy. All but DC if None."""
+
+    sta: float
+    """The time constant of the short-term average in seconds."""
+
+    lta: float
+    """The time constant of the long-term average in seconds."""
+
+    on_ratio: float
+    """STA / LTA ratio above which the detector triggers."""
+
+    off_ratio: float
+    """STA / LTA ratio below which the detector releases."""
+
+    ratio: float
+    """The STA / LTA ratio after the last block."""
+
+    triggered: bool
+    """Whether the detector is triggered."""
+
+    def __init__(
+        self,
+        samplerate: int,
+        audio_channels: int,
+        band: Optional[Tuple[float, float]] = None,
+        sta: float = 0.5,
+        lta: float = 30,
+        on_ratio: float = 4,
+        off_ratio: float = 2,
+    ) -> None:
+        """Initialise the detector.
+
+        The detector does not trigger until the LTA has been filled for
+        the length of its time constant.
+        """
+        if off_ratio > on_ratio:
+            raise ValueError("off_ratio must not be greater than on_ratio")
+
+        self.samplerate = samplerate
+        self.audio_channels = audio_channels
+        self.band = band
+        self.sta = sta
+        self.lta = lta
+        self.on_ratio = on_ratio
+        self.off_ratio = off_ratio
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the averages, e.g. after a gap in the stream."""
+        self._sta_value = 0.0
+        self._lta_value = 0.0
+        self._warmup = 0.0
+        self._mask = None
+        self.ratio = 0.0
+        self.triggered = False
+
+    def update(self, block) -> bool:
+        """Update the detector with a block of raw samples.
+
+        Returns:
+            Whether the detector is triggered after the block.
+        """
+        samples = np.frombuffer(block, dtype="<i2")
+        frames = len(samples) // self.audio_channels
+        if frames == 0:
+            return self.triggered
+
+        energy = self.energy(samples[: frames * self.audio_channels])
+        seconds = frames / self.samplerate
+
+        self._sta_value += (energy - self._sta_value) * min(1, seconds / self.sta)
+        if not self.triggered:
+            weight = min(1, seconds / min(self.lta, self._warmup + seconds))
+            self._lta_value += (energy - self._lta_value) * weight
+            self._warmup += seconds
+
+        if self._warmup < self.lta or self._lta_value <= 0:
+            self.ratio = 0.0
+            return self.triggered
+
+        self.ratio = self._sta_value / self._lta_value
+        if self.triggered:
+            self.triggered = self.ratio > self.off_ratio
+        else:
+            self.triggered = self.ratio > self.on_ratio
+
+        return self.triggered
+
+    def energy(self, samples: np.ndarray) -> float:
+        """The mean power of interleaved samples in the band, in full scale units."""
+        frames = samples.reshape(-1, self.audio_channels).T / 32768.0
+        spectrum = np.fft.rfft(frames, axis=-1)
+
+        if self._mask is None or len(self._mask) != spectrum.shape[-1]:
+            freqs = np.fft.rfftfreq(frames.shape[-1], 1 / self.samplerate)
+            low, high = self.band if self.band is not None else (0, np.inf)
+            self._mask = (freqs >= low) & (freqs <= high) & (freqs > 0)
+
+        power = np.abs(spectrum[:, self._mask]) ** 2
+        return float(2 * power.sum() / frames.shape[-1] ** 2)
@@ -26,6 +26,20 @@ class AudioRecorder(ABC):
         The temporary file should be placed in memory.
         """
 
+class AsyncAudioRecorder(ABC):
+    """Record audio without blocking the event loop.
+
+    The AsyncAudioRecorder is responsible for recording audio, e.g. from
+    an accelerometer, while other coroutines keep running.
+    """
+
+    @abstractmethod
+    async def record(self) -> Optional[data.AccelRecording]:
+        """Record audio and return the recording.
+
+        Returns None if the recording failed.
+        """
+
 class Store(ABC):
     """The Store is responsible for storing the sensor readings locally.
 
@@ -44,10 +58,51 @@ class Store(ABC):
     def store_sensor_value(self, sensor_value: data.SerialOutput) -> None:
         """Store the sensor values locally."""
 
+    @abstractmethod
+    def store_sensor_aggregate(self, aggregate_output: data.AggregateOutput) -> None:
+        """Store the aggregated sensor values locally."""
+
     @abstractmethod
     def store_accel_recording(self, accel_recording: data.AccelRecording) -> None:
         """Store the sensor values locally."""
 
+    @abstractmethod
+    def get_accel_recordings(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        hwid: Optional[str] = None,
+    ) -> List[data.AccelRecording]:
+        """Get the accelerometer recordings overlapping a time range."""
+
+    @abstractmethod
+    def get_unsynced_accel_recordings(
+        self, limit: int = 100
+    ) -> List[data.AccelRecording]:
+        """Get the accelerometer recordings not yet uploaded, oldest first."""
+
+    @abstractmethod
+    def mark_accel_recording_synced(
+        self,
+        recording_id: UUID,
+        synced_on: Optional[datetime.datetime] = None,
+    ) -> None:
+        """Record that an accelerometer recording has been uploaded."""
+
+    @abstractmethod
+    def update_accel_recording_file(
+        self, recording_id: UUID, path: Path, size: int
+    ) -> None:
+        """Point an accelerometer recording to the file that replaced it."""
+
+    @abstractmethod
+    def store_accel_compression(self, accel_compression: data.AccelCompression) -> None:
+        """Store the compressed copy of an accelerometer recording locally."""
+
+    @abstractmethod
+    def store_vibration_features(self, features: data.VibrationFeatures) -> None:
+        """Store the vibration features of an accelerometer recording locally."""
+
 
 class SerialOutputMessageBuilder(ABC):
     """Build a message from the serial output. 
@@ -64,6 +119,21 @@ class SerialOutputMessageBuilder(ABC):
          """Build a message from the serial output."""
 
 
+class AggregateOutputMessageBuilder(ABC):
+    """Build a message from the aggregated serial output.
+
+    The AggregateOutput MessageBuilder is responsible for formatting the
+    sensor statistics of a closed window to be sent over MQTT.
+    """
+
+    @abstractmethod
+    def build_message(
+        self,
+        aggregate_output: data.AggregateOutput,
+    ) -> data.Message:
+        """Build a message from the aggregated serial output."""
+
+
 class AccelRecordingMessageBuilder(ABC):
     """Build a message from the recording.
 
@@ -79,6 +149,21 @@ class AccelRecordingMessageBuilder(ABC):
         """Build a message from the recording."""
 
 
+class VibrationFeaturesMessageBuilder(ABC):
+    """Build a message from the vibration features of a recording.
+
+    The VibrationFeatures MessageBuilder is responsible for formatting the
+    features of an accelerometer recording to be sent over MQTT.
+    """
+
+    @abstractmethod
+    def build_message(
+        self,
+        features: data.VibrationFeatures,
+    ) -> data.Message:
+        """Build a message from the vibration features."""
+
+
 class Messenger(ABC):
     """Send messages to a remote server.
 
@@ -0,0 +1,419 @@
+"""Vibration features of accelerometer recordings."""
+
+import concurrent.futures
+import logging
+import queue
+import threading
+import wave
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from waspi import data
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "DEFAULT_BANDS",
+    "StreamingVibrationAnalyser",
+    "VibrationAnalyser",
+    "read_wav",
+    "welch",
+]
+
+DEFAULT_BANDS = (
+    (0, 50),
+    (50, 100),
+    (100, 200),
+    (200, 500),
+    (500, 1000),
+    (1000, 2000),
+)
+"""Default frequency bands in Hz over which the energy is summed."""
+
+Band = Tuple[float, float]
+
+
+def read_wav(path: Path) -> Tuple[np.ndarray, int]:
+    """Read a 16-bit WAV file.
+
+    Returns:
+        The samples as a (frames, channels) float32 array scaled to [-1, 1),
+        and the samplerate.
+    """
+    with wave.open(str(path), "rb") as audio_file:
+        if audio_file.getsampwidth() != 2:
+            raise ValueError(f"{path} is not a 16-bit WAV file.")
+
+        channels = audio_file.getnchannels()
+        samplerate = audio_file.getframerate()
+        frames = audio_file.readframes(audio_file.getnframes())
+
+    samples = np.frombuffer(frames, dtype="<i2").reshape(-1, channels)
+    return samples.astype(np.float32) / 32768, samplerate
+
+
+def welch(
+    samples: np.ndarray,
+    samplerate: int,
+    nperseg: int = 4096,
+    overlap: float = 0.5,
+    block_size: int = 64,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Estimate the power spectral density of every channel with Welch's method.
+
+    The signal is cut into Hann-windowed segments of nperseg frames. The
+    segments of every channel are transformed together, block_size segments
+    per FFT call, which bounds the memory used for long recordings.
+
+    Args:
+        samples: A (frames, channels) array.
+        samplerate: The samplerate in Hz.
+        nperseg: The number of frames per segment.
+        overlap: The fraction of a segment shared with the next one.
+        block_size: The number of segments transformed per FFT call.
+
+    Returns:
+        The frequencies in Hz, and a (channels, frequencies) array of power
+        spectral densities in unit**2/Hz.
+    """
+    nperseg = min(nperseg, samples.shape[0])
+    step = max(1, int(nperseg * (1 - overlap)))
+
+    # (segments, channels, nperseg) view of the signal, without copying
+    segments = np.lib.stride_tricks.sliding_window_view(samples, nperseg, axis=0)[
+        ::step
+    ]
+    window = np.hanning(nperseg).astype(samples.dtype)
+    psd = periodogram_sum(segments, window, block_size)
+
+    return np.fft.rfftfreq(nperseg, d=1 / samplerate), density(
+        psd, segments.shape[0], samplerate, window
+    )
+
+
+def periodogram_sum(
+    segments: np.ndarray, window: np.ndarray, block_size: int = 64
+) -> np.ndarray:
+    """Sum the periodograms of (segments, channels, nperseg) windowed segments.
+
+    Returns:
+        A (channels, frequencies) array.
+    """
+    nperseg = segments.shape[-1]
+    psd = np.zeros((segments.shape[1], nperseg // 2 + 1))
+
+    for start in range(0, segments.shape[0], block_size):
+        block = segments[start : start + block_size]
+        block = block - block.mean(axis=-1, keepdims=True)
+        spectrum = np.fft.rfft(block * window, axis=-1)
+        psd += np.sum(spectrum.real**2 + spectrum.imag**2, axis=0)
+
+    return psd
+
+
+def density(
+    psd_sum: np.ndarray, count: int, samplerate: int, window: np.ndarray
+) -> np.ndarray:
+    """Scale a sum of count periodograms to a one-sided power spectral density."""
+    psd = psd_sum / (count * samplerate * np.sum(window**2))
+
+    # The DC and Nyquist bins are not doubled
+    psd[:, 1 : (window.shape[0] + 1) // 2] *= 2
+    return psd
+
+
+class VibrationAnalyser:
+    """Compute vibration features for each channel of a recording.
+
+    Example:
+        >>> analyser = VibrationAnalyser(bands=[(100, 300), (300, 600)])
+        >>> features = analyser.analyse(recording)
+        >>> features.channels[0].dominant_frequency
+        248.2
+    """
+
+    bands: Sequence[Band]
+    """The frequency bands in Hz over which the energy is summed."""
+
+    nperseg: int
+    """The number of frames per Welch segment."""
+
+    overlap: float
+    """The overlap between consecutive Welch segments."""
+
+    def __init__(
+        self,
+        bands: Sequence[Band] = DEFAULT_BANDS,
+        nperseg: int = 4096,
+        overlap: float = 0.5,
+        significant_digits: int = 5,
+    ) -> None:
+        """Initialise the analyser.
+
+        The features are rounded to significant_digits to keep the messages
+        small.
+        """
+        self.bands = [tuple(band) for band in bands]
+        self.nperseg = nperseg
+        self.overlap = overlap
+        self.significant_digits = significant_digits
+
+    def analyse(self, recording: data.AccelRecording) -> data.VibrationFeatures:
+        """Read the WAV file of a recording and compute its features."""
+        samples, samplerate = read_wav(recording.path)
+        channels = self.analyse_samples(samples, samplerate)
+
+        return data.VibrationFeatures(
+            recording_id=recording.id,
+            datetime=recording.datetime,
+            hwid=recording.hwid,
+            samplerate=samplerate,
+            duration=samples.shape[0] / samplerate,
+            bands=self.bands,
+            channels=channels,
+        )
+
+    def analyse_samples(self, samples: np.ndarray, samplerate: int) -> list:
+        """Compute the features of every channel of a (frames, channels) array."""
+        rms = np.sqrt(np.mean(np.square(samples, dtype=np.float64), axis=0))
+        peak = np.max(np.abs(samples), axis=0)
+        freqs, psd = welch(samples, samplerate, self.nperseg, self.overlap)
+        return self.channel_features(rms, peak, freqs, psd)
+
+    def channel_features(
+        self, rms: np.ndarray, peak: np.ndarray, freqs: np.ndarray, psd: np.ndarray
+    ) -> list:
+        """Build the features of every channel from its level and spectrum."""
+        crest_factor = np.divide(
+            peak, rms, out=np.zeros_like(rms), where=rms > 0
+        )
+        df = freqs[1] - freqs[0]
+
+        # (bands, frequencies) mask, summed for every channel in one product
+        masks = np.array(
+            [(freqs >= low) & (freqs < high) for low, high in self.bands]
+        )
+        band_energies = psd @ masks.T * df
+
+        total = psd.sum(axis=1)
+        centroid = np.divide(
+            psd @ freqs, total, out=np.zeros_like(total), where=total > 0
+        )
+        # The DC bin is left out of the dominant frequency
+        dominant = freqs[1 + np.argmax(psd[:, 1:], axis=1)]
+
+        r = self._round
+        return [
+            data.ChannelFeatures(
+                channel=channel,
+                rms=r(rms[channel]),
+                peak=r(peak[channel]),
+                crest_factor=r(crest_factor[channel]),
+                band_energies=[r(e) for e in band_energies[channel]],
+                spectral_centroid=r(centroid[channel]),
+                dominant_frequency=r(dominant[channel]),
+            )
+            for channel in range(rms.shape[0])
+        ]
+
+    def _round(self, value) -> float:
+        """Round a value to the significant digits of the analyser."""
+        return float(f"{value:.{self.significant_digits}g}")
+
+
+class StreamingVibrationAnalyser:
+    """Compute vibration features from capture chunks as they arrive.
+
+    Raw S16_LE chunks are passed to feed, e.g. from the arecord pipe or the
+    PyAudio capture, and processed by a worker thread. The thread keeps the
+    frames that overlap the next Welch segment, and running sums of the
+    periodograms, squared samples and peaks, so memory does not depend on
+    the segment length and the WAV file is never read back. Calling
+    end_segment returns the features of every frame fed since the previous
+    call, with the same values as VibrationAnalyser.analyse on the file.
+
+    At most queue_size chunks are kept waiting. If the worker falls behind,
+    chunks are dropped and counted instead of blocking the capture, and the
+    features of a segment that lost chunks are rejected. Segment ends are
+    never dropped and never wait, so end_segment is safe to call from the
+    event loop.
+
+    Example:
+        >>> streaming = StreamingVibrationAnalyser(44100, 2)
+        >>> streaming.feed(chunk)
+        >>> features = streaming.end_segment(recording).result()
+    """
+
+    dropped_chunks: int
+    """Total number of chunks dropped because the queue was full."""
+
+    queue_size: int
+    """Maximum number of chunks waiting for the worker."""
+
+    def __init__(
+        self,
+        samplerate: int,
+        audio_channels: int,
+        analyser: Optional[VibrationAnalyser] = None,
+        queue_size: int = 64,
+    ) -> None:
+        """Initialise the analyser and start its worker thread."""
+        self.samplerate = samplerate
+        self.audio_channels = audio_channels
+        self.analyser = analyser if analyser is not None else VibrationAnalyser()
+        self.nperseg = self.analyser.nperseg
+        self.step = max(1, int(self.nperseg * (1 - self.analyser.overlap)))
+        self.window = np.hanning(self.nperseg).astype(np.float32)
+        self.frame_size = 2 * audio_channels
+        self.dropped_chunks = 0
+        self.queue_size = queue_size
+        # Unbounded, so segment ends never block; chunks are bounded by
+        # _pending instead
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._segment_dropped = 0
+        self._reset()
+        self._thread = threading.Thread(
+            target=self._run, name="vibration-analyser", daemon=True
+        )
+        self._thread.start()
+
+    def feed(self, chunk) -> bool:
+        """Queue a chunk of raw samples without waiting.
+
+        The chunk must not be modified afterwards. Returns False if the
+        chunk was dropped.
+        """
+        with self._lock:
+            if self._pending >= self.queue_size:
+                self.dropped_chunks += 1
+                self._segment_dropped += 1
+                return False
+            self._pending += 1
+
+        self.queue.put(chunk)
+        return True
+
+    def end_segment(
+        self, recording: data.AccelRecording
+    ) -> "concurrent.futures.Future[data.VibrationFeatures]":
+        """Close the current segment.
+
+        Returns:
+            A future resolved with the features of the frames fed since the
+            previous segment, once the worker has processed them. It fails
+            with a ValueError if chunks of the segment were dropped.
+        """
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._lock:
+            dropped = self._segment_dropped
+            self._segment_dropped = 0
+            self.queue.put((recording, future, dropped))
+        return future
+
+    def close(self, timeout: Optional[float] = 5) -> None:
+        """Stop the worker thread once the queued chunks are processed."""
+        self.queue.put(None)
+        self._thread.join(timeout)
+
+    def _reset(self) -> None:
+        """Clear the state of the current segment."""
+        channels = self.audio_channels
+        self.frames = 0
+        self.segments = 0
+        self.sum_squares = np.zeros(channels)
+        self.peak = np.zeros(channels, dtype=np.float32)
+        self.psd_sum = np.zeros((channels, self.nperseg // 2 + 1))
+        self.overlap = np.zeros((0, channels), dtype=np.float32)
+        self.partial_frame = b""
+
+    def _run(self) -> None:
+        """Process the queued chunks and segment ends in order."""
+        while True:
+            item = self.queue.get()
+
+            if item is None:
+                return
+
+            if isinstance(item, tuple):
+                recording, future, dropped = item
+                try:
+                    future.set_result(self._end_segment(recording, dropped))
+                except Exception as e:
+                    future.set_exception(e)
+                self._reset()
+                continue
+
+            with self._lock:
+                self._pending -= 1
+
+            try:
+                self._process(item)
+            except Exception as e:
+                logger.error(f"Could not analyse a capture chunk: {e}")
+
+    def _process(self, chunk) -> None:
+        """Add a chunk of raw samples to the running sums."""
+        if self.partial_frame:
+            chunk = self.partial_frame + bytes(chunk)
+
+        size = len(chunk) - len(chunk) % self.frame_size
+        self.partial_frame = bytes(chunk[size:])
+        if size == 0:
+            return
+
+        samples = np.frombuffer(chunk, dtype="<i2", count=size // 2)
+        samples = samples.reshape(-1, self.audio_channels).astype(np.float32) / 32768
+
+        self.frames += samples.shape[0]
+        self.sum_squares += np.sum(np.square(samples, dtype=np.float64), axis=0)
+        np.maximum(self.peak, np.max(np.abs(samples), axis=0), out=self.peak)
+
+        # Overlap-save: prepend the frames the next segment starts with
+        samples = np.concatenate([self.overlap, samples])
+        count = 0
+        if samples.shape[0] >= self.nperseg:
+            segments = np.lib.stride_tricks.sliding_window_view(
+                samples, self.nperseg, axis=0
+            )[:: self.step]
+            count = segments.shape[0]
+            self.psd_sum += periodogram_sum(segments, self.window)
+            self.segments += count
+
+        self.overlap = samples[count * self.step :].copy()
+
+    def _end_segment(
+        self, recording: data.AccelRecording, dropped: int
+    ) -> data.VibrationFeatures:
+        """Build the features of the current segment."""
+        if dropped:
+            raise ValueError(
+                f"{dropped} capture chunks of {recording.path} dropped by the "
+                "vibration analyser, features are incomplete"
+            )
+
+        if self.frames == 0:
+            raise ValueError(f"No samples received for {recording.path}")
+
+        if self.segments > 0:
+            freqs = np.fft.rfftfreq(self.nperseg, d=1 / self.samplerate)
+            psd = density(self.psd_sum, self.segments, self.samplerate, self.window)
+        else:
+            # Shorter than a Welch segment, use the frames kept for overlap
+            freqs, psd = welch(self.overlap, self.samplerate, self.nperseg)
+
+        rms = np.sqrt(self.sum_squares / self.frames)
+        channels = self.analyser.channel_features(rms, self.peak, freqs, psd)
+
+        return data.VibrationFeatures(
+            recording_id=recording.id,
+            datetime=recording.datetime,
+            hwid=recording.hwid,
+            samplerate=self.samplerate,
+            duration=self.frames / self.samplerate,
+            bands=self.analyser.bands,
+            channels=channels,
+        )
@@ -1,8 +1,9 @@
 """Data objects for waspi system.py"""
 import datetime
+from array import array
 from enum import IntEnum
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 from uuid import UUID, uuid4
 from pydantic import Field, BaseModel
 from dataclasses import dataclass
@@ -64,6 +65,103 @@ class SerialOutput(BaseModel):
     """The message to be sent. Usually a JSON string."""
 
 
+class SensorFrame:
+    """A decoded sensor report, kept compact for high-rate processing.
+
+    The values are stored in an array in the order of hwids. The hwids
+    sequence is shared by all the frames decoded with the same schema, and
+    the frame has a single receive timestamp. Convert to a SerialOutput only
+    where a pydantic model or JSON is needed.
+    """
+
+    __slots__ = ("hwids", "values", "received_on")
+
+    hwids: Sequence[str]
+    """The sensor hardware ids, in the order of the values."""
+
+    values: array
+    """The sensor values."""
+
+    received_on: float
+    """The unix time at which the report was received."""
+
+    def __init__(self, hwids: Sequence[str], values: array, received_on: float):
+        self.hwids = hwids
+        self.values = values
+        self.received_on = received_on
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __repr__(self) -> str:
+        return f"SensorFrame(received_on={self.received_on}, values={self.to_dict()})"
+
+    def get(self, hwid: str) -> float:
+        """Get the value of a sensor."""
+        return self.values[self.hwids.index(hwid)]
+
+    def to_dict(self) -> Dict[str, float]:
+        """Map each hwid to its value."""
+        return dict(zip(self.hwids, self.values))
+
+    def to_serial_output(self, decimals: int = 3) -> "SerialOutput":
+        """Build the SerialOutput of the frame, rounding the values."""
+        content = {
+            hwid: SensorValue(
+                hwid=hwid, value=round(value, decimals), timestamp=self.received_on
+            )
+            for hwid, value in zip(self.hwids, self.values)
+        }
+        return SerialOutput(
+            content=content,
+            datetime=datetime.datetime.fromtimestamp(self.received_on),
+        )
+
+
+class SensorAggregate(BaseModel):
+    """Statistics of a sensor over an aggregation window."""
+
+    hwid: str
+    """The sensor hardware id to identify the sensor."""
+
+    count: int
+    """The number of readings in the window."""
+
+    min: float
+    """The lowest reading in the window."""
+
+    max: float
+    """The highest reading in the window."""
+
+    mean: float
+    """The mean of the readings in the window."""
+
+    std: float
+    """The population standard deviation of the readings in the window."""
+
+    last: float
+    """The last reading in the window."""
+
+
+class AggregateOutput(BaseModel):
+    """The aggregated serial output over a time window."""
+
+    id: UUID = Field(default_factory=uuid4)
+    """The unique ID of the message."""
+
+    window: float
+    """The length of the window in seconds."""
+
+    start: datetime.datetime
+    """The datetime when the window started."""
+
+    end: datetime.datetime
+    """The datetime when the window ended."""
+
+    content: Dict[str, SensorAggregate] = Field(default_factory=dict)
+    """The statistics of each sensor."""
+
+
 class Recording(BaseModel):
     """A Recording is a single audio file recorded from the microphone."""
 
@@ -90,6 +188,28 @@ class Recording(BaseModel):
     """The unique ID of the recording"""
 
 
+class AccelTrigger(BaseModel):
+    """Why and how an event-triggered accelerometer recording was saved."""
+
+    triggered_on: datetime.datetime
+    """The datetime when the detector first triggered."""
+
+    released_on: datetime.datetime
+    """The datetime when the detector last released."""
+
+    peak_ratio: float
+    """The highest STA / LTA ratio during the event."""
+
+    triggers: int = 1
+    """The number of merged triggers in the recording."""
+
+    pre_roll: float
+    """The seconds of audio kept before the first trigger."""
+
+    post_roll: float
+    """The seconds of audio kept after the last release."""
+
+
 class AccelRecording(BaseModel):
     """A reading from a sensor."""
     
@@ -105,6 +225,110 @@ class AccelRecording(BaseModel):
     path: Optional[Path] = None
     """The path to the audio file in the local filesystem"""
 
+    end: Optional[datetime.datetime] = None
+    """The datetime just after the last frame of the recording."""
+
+    duration: Optional[float] = None
+    """The duration of the recording in seconds."""
+
+    samplerate: Optional[int] = None
+    """The samplerate of the recording in Hz."""
+
+    audio_channels: Optional[int] = None
+    """The number of audio channels in the recording."""
+
+    size: Optional[int] = None
+    """The size of the audio file in bytes."""
+
+    checksum: Optional[str] = None
+    """The MD5 of the samples, as stored by FLAC, in hex."""
+
+    synced_on: Optional[datetime.datetime] = None
+    """The datetime when the recording was uploaded, None if not yet."""
+
+    trigger: Optional[AccelTrigger] = None
+    """The trigger of the recording, if it was event-triggered."""
+
+
+class AccelCompression(BaseModel):
+    """A lossless compressed copy of an accelerometer recording."""
+
+    id: UUID = Field(default_factory=uuid4)
+    """The unique ID of the compression."""
+
+    recording_id: UUID
+    """The ID of the compressed AccelRecording."""
+
+    path: Path
+    """The path to the compressed file in the local filesystem."""
+
+    original_size: int
+    """The size of the original file in bytes."""
+
+    compressed_size: int
+    """The size of the compressed file in bytes."""
+
+    compression_ratio: float
+    """The compressed size as a fraction of the original size."""
+
+    created_on: datetime.datetime = Field(
+        default_factory=datetime.datetime.now
+    )
+    """The datetime when the recording was compressed."""
+
+
+class ChannelFeatures(BaseModel):
+    """Vibration features of a single accelerometer channel."""
+
+    channel: int
+    """The index of the channel in the recording."""
+
+    rms: float
+    """The root mean square of the signal, in full scale units."""
+
+    peak: float
+    """The largest absolute sample, in full scale units."""
+
+    crest_factor: float
+    """The ratio of the peak to the RMS."""
+
+    band_energies: List[float]
+    """The energy in each frequency band of the VibrationFeatures."""
+
+    spectral_centroid: float
+    """The power weighted mean frequency in Hz."""
+
+    dominant_frequency: float
+    """The frequency with the most power in Hz."""
+
+
+class VibrationFeatures(BaseModel):
+    """Vibration features computed from an accelerometer recording."""
+
+    id: UUID = Field(default_factory=uuid4)
+    """The unique ID of the features."""
+
+    recording_id: UUID
+    """The ID of the analysed AccelRecording."""
+
+    datetime: datetime.datetime
+    """The datetime when the recording was made."""
+
+    hwid: str
+    """The sensor hardware id to identify the sensor."""
+
+    samplerate: int
+    """The samplerate of the recording in Hz."""
+
+    duration: float
+    """The duration of the recording in seconds."""
+
+    bands: List[Tuple[float, float]]
+    """The frequency bands in Hz of the band energies."""
+
+    channels: List[ChannelFeatures] = Field(default_factory=list)
+    """The features of each channel."""
+
 
 class Message(BaseModel):
     """The message to be sent to remote server."""
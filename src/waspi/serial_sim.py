@@ -0,0 +1,562 @@
+"""Fake Arduino, capture and replay tools for the waspi serial link.
+
+The tools create a pseudo-terminal that behaves like the Arduino serial
+port, so SerialTransfer and SerialReceiver can be run, benchmarked and
+regression-tested without hardware.
+
+Usage:
+    Emit periodic reports at 10 Hz, 5% of them with a corrupted CRC:
+
+    $ python -m waspi.serial_sim simulate --rate 10 --crc-errors 0.05
+
+    Record the raw byte stream of the real Arduino for 10 minutes:
+
+    $ python -m waspi.serial_sim record /dev/ttyACM0 capture.bin --duration 600
+
+    Replay a capture 20 times faster than it was recorded, once the port
+    has been opened:
+
+    $ python -m waspi.serial_sim replay capture.bin --speed 20
+
+    Measure frames/sec, parse latency and CPU per frame:
+
+    $ python -m waspi.serial_sim bench --rate 200 --duration 10
+"""
+
+import argparse
+import asyncio
+import fcntl
+import os
+import pty
+import random
+import select
+import signal
+import struct
+import termios
+import threading
+import time
+import tty
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import serial
+
+from pySerialTransfer.CRC import CRC
+from pySerialTransfer.pySerialTransfer import MAX_PACKET_SIZE, START_BYTE, STOP_BYTE
+
+__all__ = [
+    "FakeArduino",
+    "HWID_LIST",
+    "decode_frames",
+    "encode_frame",
+    "periodic_report_payload",
+    "read_capture",
+    "record",
+    "replay",
+]
+
+HWID_LIST = [
+    "weight_scale",
+    "temp_sht45_0",
+    "hum_sht45_0",
+    "temp_sht45_1",
+    "hum_sht45_1",
+    "temp_scd41",
+    "hum_scd41",
+    "co2ppm_scd41",
+]
+"""Fields of the periodic report, in the order sendPeriodicReport packs them."""
+
+CAPTURE_HEADER = struct.Struct("<dI")
+"""Header of each chunk in a capture file: receive time and chunk length."""
+
+ERROR_KINDS = ("crc", "length", "stop")
+"""Frame errors that can be injected."""
+
+MEASURE_REQUEST_ID = 1
+MEASURE_REPLY_ID = 2
+"""Packet IDs of host measurement requests and their replies."""
+
+_crc = CRC()
+
+
+def encode_frame(
+    payload: bytes,
+    packet_id: int = 0,
+    error: Optional[str] = None,
+) -> bytes:
+    """Build a SerialTransfer frame the way the Arduino library does.
+
+    The payload is COBS stuffed against START_BYTE, the CRC is computed over
+    the stuffed payload, and the frame is wrapped in START_BYTE, packet ID,
+    overhead byte, length, CRC and STOP_BYTE.
+
+    Args:
+        payload: The payload bytes, at most MAX_PACKET_SIZE long.
+        packet_id: The packet ID of the frame.
+        error: Optionally corrupt the frame: "crc" sends a wrong CRC,
+            "length" a length byte above MAX_PACKET_SIZE and "stop" a wrong
+            stop byte.
+    """
+    if len(payload) > MAX_PACKET_SIZE:
+        raise ValueError(f"Payload longer than {MAX_PACKET_SIZE} bytes.")
+
+    stuffed = bytearray(payload)
+    positions = [i for i, byte in enumerate(stuffed) if byte == START_BYTE]
+
+    for current, following in zip(positions, positions[1:]):
+        stuffed[current] = following - current
+    if positions:
+        stuffed[positions[-1]] = 0
+
+    overhead = positions[0] if positions else 0xFF
+    length = len(stuffed)
+    checksum = _crc.calculate_buffer(stuffed)
+    stop = STOP_BYTE
+
+    if error == "crc":
+        checksum ^= 0xFF
+    elif error == "length":
+        length = MAX_PACKET_SIZE + 1
+    elif error == "stop":
+        stop = STOP_BYTE ^ 0xFF
+    elif error is not None:
+        raise ValueError(f"Unknown frame error {error!r}.")
+
+    return (
+        bytes((START_BYTE, packet_id, overhead, length))
+        + bytes(stuffed)
+        + bytes((checksum, stop))
+    )
+
+
+def decode_frames(buff: bytearray) -> Iterator[Tuple[int, bytes]]:
+    """Decode and remove the complete valid frames at the start of a buffer.
+
+    Bytes that cannot start a valid frame are discarded. An incomplete frame
+    at the end is left in the buffer.
+
+    Yields:
+        The packet ID and the unstuffed payload of each frame.
+    """
+    while True:
+        start = buff.find(START_BYTE)
+        if start == -1:
+            del buff[:]
+            return
+        del buff[:start]
+
+        if len(buff) < 4:
+            return
+
+        length = buff[3]
+        end = 4 + length + 2
+        if length > MAX_PACKET_SIZE:
+            del buff[:1]
+            continue
+        if len(buff) < end:
+            return
+
+        payload = bytearray(buff[4:(4 + length)])
+        valid = (
+            _crc.calculate_buffer(payload) == buff[end - 2]
+            and buff[end - 1] == STOP_BYTE
+        )
+        if not valid:
+            del buff[:1]
+            continue
+
+        index = buff[2]
+        while index < length:
+            delta = payload[index]
+            payload[index] = START_BYTE
+            if not delta:
+                break
+            index += delta
+
+        packet_id = buff[1]
+        del buff[:end]
+        yield packet_id, bytes(payload)
+
+
+def periodic_report_payload(values: Sequence[float]) -> bytes:
+    """Pack sensor values like arduino_waspi.ino's sendPeriodicReport."""
+    return struct.pack(f"<{len(values)}f", *values)
+
+
+class FakeArduino:
+    """A pseudo-terminal that emits periodic reports like the Arduino.
+
+    Open ``port`` with SerialTransfer or SerialReceiver as if it was the
+    real device.
+
+    Example:
+        >>> arduino = FakeArduino(rate=10)
+        >>> arduino.start()
+        >>> receiver = SerialReceiver(arduino.port, 115200, HWID_LIST)
+        >>> arduino.stop()
+    """
+
+    port: str
+    """Path of the pseudo-terminal to open as the serial port."""
+
+    sent: List[Tuple[int, float]]
+    """Sequence number and send time of every valid frame written."""
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        packet_id: int = 0,
+        error_rates: Optional[dict] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        """Create the pseudo-terminal.
+
+        Args:
+            rate: Frames per second.
+            packet_id: Packet ID of the emitted reports.
+            error_rates: Probability of each injected error, keyed by
+                "crc", "length" and "stop".
+            seed: Seed for the random sensor values and errors.
+        """
+        self.rate = rate
+        self.packet_id = packet_id
+        self.error_rates = error_rates or {}
+        self.random = random.Random(seed)
+        self.sent = []
+
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._server: Optional[threading.Thread] = None
+
+    def values(self, sequence: int) -> List[float]:
+        """Sensor values of a report. The weight carries the sequence number."""
+        rnd = self.random
+        return [
+            float(sequence),
+            20 + rnd.gauss(0, 0.5),
+            55 + rnd.gauss(0, 2),
+            21 + rnd.gauss(0, 0.5),
+            52 + rnd.gauss(0, 2),
+            22 + rnd.gauss(0, 0.5),
+            50 + rnd.gauss(0, 2),
+            450 + rnd.gauss(0, 20),
+        ]
+
+    def frames(
+        self, count: Optional[int] = None
+    ) -> Iterator[Tuple[int, bytes, Optional[str]]]:
+        """Generate sequence numbers, frames and injected errors."""
+        sequence = 0
+        while count is None or sequence < count:
+            error = None
+            for kind in ERROR_KINDS:
+                if self.random.random() < self.error_rates.get(kind, 0):
+                    error = kind
+                    break
+
+            payload = periodic_report_payload(self.values(sequence))
+            yield sequence, encode_frame(payload, self.packet_id, error), error
+            sequence += 1
+
+    def run(self, count: Optional[int] = None) -> None:
+        """Write frames at the configured rate until stopped."""
+        interval = 1 / self.rate
+        next_time = time.monotonic()
+
+        for sequence, frame, error in self.frames(count):
+            if self._stop.is_set():
+                break
+
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_time += interval
+
+            if error is None:
+                self.sent.append((sequence, time.time()))
+            os.write(self.master, frame)
+
+    def serve_requests(self) -> None:
+        """Answer measurement requests from the host until stopped.
+
+        Each request carries a uint16 sequence number, which is echoed back
+        ahead of the sensor values like handleMeasureRequest does.
+        """
+        buff = bytearray()
+        sequence = 0
+
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self.master], [], [], 0.1)
+            if not ready:
+                continue
+
+            buff += os.read(self.master, 4096)
+
+            for packet_id, payload in decode_frames(buff):
+                if packet_id != MEASURE_REQUEST_ID:
+                    continue
+
+                reply = payload[:2] + periodic_report_payload(self.values(sequence))
+                os.write(self.master, encode_frame(reply, MEASURE_REPLY_ID))
+                sequence += 1
+
+    def start_serving(self) -> None:
+        """Answer measurement requests from a background thread."""
+        self._stop.clear()
+        self._server = threading.Thread(target=self.serve_requests, daemon=True)
+        self._server.start()
+
+    def start(self, count: Optional[int] = None) -> None:
+        """Write frames from a background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, args=(count,), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop writing frames."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._server is not None:
+            self._server.join()
+            self._server = None
+
+    def wait_opened(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the port is opened, e.g. before replaying a capture.
+
+        pyserial flushes the input buffer when it opens a port, so bytes
+        written before then are lost. The master is put in packet mode, in
+        which that flush is reported to it.
+
+        Returns:
+            Whether the port was opened before the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        fcntl.ioctl(self.master, termios.TIOCPKT, struct.pack("i", 1))
+
+        try:
+            while True:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+
+                readable, _, _ = select.select([self.master], [], [], remaining)
+                if readable:
+                    # In packet mode, reads start with a status byte
+                    packet = os.read(self.master, 1 + MAX_PACKET_SIZE)
+                    if packet[0] & termios.TIOCPKT_FLUSHREAD:
+                        return True
+
+        finally:
+            fcntl.ioctl(self.master, termios.TIOCPKT, struct.pack("i", 0))
+
+    def close(self) -> None:
+        """Stop and close the pseudo-terminal."""
+        self.stop()
+        os.close(self.master)
+        os.close(self.slave)
+
+
+def record(port: str, baud: int, path: Path, duration: float) -> int:
+    """Record the raw byte stream of a serial port with receive timestamps.
+
+    Returns:
+        The number of bytes recorded.
+    """
+    total = 0
+    end = time.monotonic() + duration
+
+    with serial.Serial(port, baud, timeout=0.1) as connection, open(path, "wb") as f:
+        while time.monotonic() < end:
+            chunk = connection.read(max(1, connection.in_waiting))
+            if not chunk:
+                continue
+
+            f.write(CAPTURE_HEADER.pack(time.time(), len(chunk)))
+            f.write(chunk)
+            total += len(chunk)
+
+    return total
+
+
+def read_capture(path: Path) -> Iterator[Tuple[float, bytes]]:
+    """Read the timestamped chunks of a capture file."""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(CAPTURE_HEADER.size)
+            if len(header) < CAPTURE_HEADER.size:
+                return
+
+            timestamp, length = CAPTURE_HEADER.unpack(header)
+            yield timestamp, f.read(length)
+
+
+def replay(path: Path, fd: int, speed: float = 1.0) -> int:
+    """Write a capture to a file descriptor, keeping its timing.
+
+    Args:
+        path: The capture file.
+        fd: The file descriptor to write to, e.g. FakeArduino.master.
+        speed: Replay speed, 1 for real time. 0 writes as fast as possible.
+
+    Returns:
+        The number of bytes replayed.
+    """
+    total = 0
+    first = None
+    start = time.monotonic()
+
+    for timestamp, chunk in read_capture(path):
+        if first is None:
+            first = timestamp
+
+        if speed > 0:
+            delay = (timestamp - first) / speed - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+
+        os.write(fd, chunk)
+        total += len(chunk)
+
+    return total
+
+
+async def benchmark(rate: float, duration: float, error_rates: dict) -> dict:
+    """Run SerialReceiver unchanged against a FakeArduino and time it."""
+    from waspi.components.sensor_manager import SerialReceiver
+
+    arduino = FakeArduino(rate=rate, error_rates=error_rates, seed=0)
+    receiver = SerialReceiver(arduino.port, 115200, HWID_LIST)
+    received = []
+
+    async def consume():
+        async for sensor_frame in receiver.frames(maxsize=1024):
+            sequence = int(sensor_frame.get("weight_scale"))
+            received.append((sequence, sensor_frame.received_on))
+
+    task = asyncio.create_task(consume())
+    await asyncio.sleep(0.1)
+
+    cpu_start = time.thread_time()
+    start = time.monotonic()
+    arduino.start()
+    await asyncio.sleep(duration)
+    arduino.stop()
+    await asyncio.sleep(0.2)
+    elapsed = time.monotonic() - start
+    cpu = time.thread_time() - cpu_start
+
+    task.cancel()
+    await receiver.close()
+    arduino.close()
+
+    sent = dict(arduino.sent)
+    delays = sorted(
+        received_on - sent[sequence]
+        for sequence, received_on in received
+        if sequence in sent
+    )
+
+    return {
+        "frames_sent": len(arduino.sent),
+        "frames_received": len(received),
+        "frames_per_sec": len(received) / elapsed,
+        "latency_p50_ms": 1000 * delays[len(delays) // 2] if delays else None,
+        "latency_max_ms": 1000 * delays[-1] if delays else None,
+        "cpu_per_frame_us": 1e6 * cpu / len(received) if received else None,
+    }
+
+
+def _error_rates(args) -> dict:
+    return {"crc": args.crc_errors, "length": args.length_errors, "stop": args.stop_errors}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_error_args(subparser):
+        subparser.add_argument("--crc-errors", type=float, default=0)
+        subparser.add_argument("--length-errors", type=float, default=0)
+        subparser.add_argument("--stop-errors", type=float, default=0)
+
+    simulate_parser = subparsers.add_parser("simulate", help="emit fake periodic reports")
+    simulate_parser.add_argument("--rate", type=float, default=1.0)
+    simulate_parser.add_argument("--count", type=int, default=None)
+    simulate_parser.add_argument("--packet-id", type=int, default=0)
+    simulate_parser.add_argument(
+        "--serve-requests", action="store_true", help="answer measurement requests"
+    )
+    add_error_args(simulate_parser)
+
+    record_parser = subparsers.add_parser("record", help="record a serial port")
+    record_parser.add_argument("port")
+    record_parser.add_argument("path", type=Path)
+    record_parser.add_argument("--baud", type=int, default=115200)
+    record_parser.add_argument("--duration", type=float, default=60)
+
+    replay_parser = subparsers.add_parser("replay", help="replay a capture on a pty")
+    replay_parser.add_argument("path", type=Path)
+    replay_parser.add_argument("--speed", type=float, default=1.0)
+    replay_parser.add_argument(
+        "--no-wait",
+        action="store_true",
+        help="replay immediately instead of waiting for the port to be opened",
+    )
+
+    bench_parser = subparsers.add_parser("bench", help="benchmark SerialReceiver")
+    bench_parser.add_argument("--rate", type=float, default=100)
+    bench_parser.add_argument("--duration", type=float, default=10)
+    add_error_args(bench_parser)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "simulate":
+        arduino = FakeArduino(
+            rate=args.rate, packet_id=args.packet_id, error_rates=_error_rates(args)
+        )
+        print(f"Fake Arduino on {arduino.port}")
+        if args.serve_requests:
+            arduino.start_serving()
+        try:
+            arduino.run(args.count)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            arduino.close()
+
+    elif args.command == "record":
+        total = record(args.port, args.baud, args.path, args.duration)
+        print(f"Recorded {total} bytes to {args.path}")
+
+    elif args.command == "replay":
+        arduino = FakeArduino()
+        try:
+            if not args.no_wait:
+                print(f"Waiting for {arduino.port} to be opened...")
+                arduino.wait_opened()
+
+            print(f"Replaying {args.path} on {arduino.port}")
+            total = replay(args.path, arduino.master, args.speed)
+            # Closing the pseudo-terminal discards the bytes not read yet
+            print(f"Replayed {total} bytes, press Ctrl-C to close {arduino.port}")
+            signal.pause()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            arduino.close()
+
+    elif args.command == "bench":
+        results = asyncio.run(benchmark(args.rate, args.duration, _error_rates(args)))
+        for key, value in results.items():
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
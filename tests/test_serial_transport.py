@@ -0,0 +1,87 @@
+"""Tests of the SerialTransfer frame reader and packet dispatch."""
+
+import asyncio
+import os
+import tty
+
+from pySerialTransfer import pySerialTransfer as txfr
+from waspi.components.packet_registry import PacketRegistry
+from waspi.components.serial_transport import SerialFrameReader
+
+
+class PtyWriter:
+    """Write the frames of a sender link to the controller side of a pty."""
+
+    def __init__(self, fd: int) -> None:
+        self.fd = fd
+
+    def write(self, frame) -> int:
+        return os.write(self.fd, frame)
+
+
+def open_pty_links():
+    """Create a receiving link on a pty and a sender writing to it."""
+    controller, device = os.openpty()
+    tty.setraw(device)
+    path = os.ttyname(device)
+
+    receiver = txfr.SerialTransfer(path, restrict_ports=False)
+    sender = txfr.SerialTransfer(path, restrict_ports=False)
+    sender.open = lambda: True
+    sender.connection = PtyWriter(controller)
+    return receiver, sender, controller, device
+
+
+def test_empty_payload_frames_are_dispatched():
+    receiver, sender, controller, device = open_pty_links()
+    registry = PacketRegistry()
+    received = []
+
+    async def on_ack(frame, values):
+        received.append(values)
+
+    registry.register(5, None, on_ack, name="ack")
+
+    async def run():
+        reader = SerialFrameReader(receiver)
+        reader.start()
+        try:
+            sender.txBuff[0] = 1
+            sender.send(1, packet_id=5)
+            sender.send(0, packet_id=5)
+
+            for _ in range(2):
+                frame = await asyncio.wait_for(reader.read_frame(), 2)
+                await registry.dispatch(frame)
+        finally:
+            reader.stop()
+            receiver.close()
+
+    try:
+        asyncio.run(run())
+    finally:
+        os.close(controller)
+        os.close(device)
+
+    assert received == [b"\x01", b""]
+
+
+def test_tick_calls_back_on_empty_payload_frames():
+    receiver, sender, controller, device = open_pty_links()
+    received = []
+    receiver.set_callbacks({5: lambda: received.append(receiver.bytesRead)})
+
+    try:
+        assert receiver.open()
+        sender.send(0, packet_id=5)
+
+        for _ in range(20):
+            if receiver.tick():
+                break
+
+        receiver.close()
+    finally:
+        os.close(controller)
+        os.close(device)
+
+    assert received == [0]